@@ -0,0 +1,107 @@
+import os
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, WalletAddress
+
+logger = logging.getLogger(__name__)
+
+# How long a resolved principal is trusted before it is looked up again
+ADDRESS_CACHE_TTL = timedelta(hours=int(os.getenv('ADDRESS_CACHE_TTL_HOURS', '168')))
+# Users without an address are re-checked more often, they may link a wallet later
+ADDRESS_NEGATIVE_TTL = timedelta(hours=int(os.getenv('ADDRESS_NEGATIVE_TTL_HOURS', '24')))
+# Threads per process resolving addresses of newly registered users
+ADDRESS_PREFETCH_WORKERS = int(os.getenv('ADDRESS_PREFETCH_WORKERS', '2'))
+
+
+def fetch_vly_wallet_addresses(vly_user_ids):
+    # Imported on first use, vly_wallet_api loads ic-py, requests and httpx
+    from vly_wallet_api import fetch_vly_wallet_addresses
+    return fetch_vly_wallet_addresses(vly_user_ids)
+
+
+def resolve_addresses(vly_user_ids: List[str],
+                      now: Optional[datetime] = None) -> Tuple[Dict[str, Optional[str]], List[str]]:
+    """
+    Map vly_user_ids to ICP principals, only calling the user_mapping API for
+    entries that are missing from the wallet_address table or have expired.
+    Lookups that fail are not cached; the previous value is used if there is one.
+    Returns the mapping and the users whose lookup failed with no previous value.
+    """
+    now = now or datetime.utcnow()
+    cached = {
+        entry.vly_user_id: entry
+        for entry in WalletAddress.query.filter(WalletAddress.vly_user_id.in_(vly_user_ids)).all()
+    } if vly_user_ids else {}
+
+    stale = [
+        vly_user_id for vly_user_id in vly_user_ids
+        if vly_user_id not in cached
+        or not cached[vly_user_id].is_fresh(now, ADDRESS_CACHE_TTL, ADDRESS_NEGATIVE_TTL)
+    ]
+    logger.info(f"Address cache: {len(vly_user_ids) - len(stale)} fresh, {len(stale)} to resolve")
+
+    fetched, failed = fetch_vly_wallet_addresses(stale)
+    if failed:
+        logger.warning(f"Failed to resolve addresses for {len(failed)} users")
+
+    for vly_user_id, address in fetched.items():
+        entry = cached.get(vly_user_id)
+        if entry is None:
+            entry = WalletAddress(vly_user_id=vly_user_id)
+            db.session.add(entry)
+            cached[vly_user_id] = entry
+        entry.address = address
+        entry.fetched_at = now
+
+    # Read everything before committing, commit expires the loaded entries
+    addresses = {
+        vly_user_id: cached[vly_user_id].address if vly_user_id in cached else None
+        for vly_user_id in vly_user_ids
+    }
+    unresolved = [vly_user_id for vly_user_id in failed if vly_user_id not in cached]
+
+    try:
+        db.session.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"Error saving wallet address cache: {str(e)}")
+        db.session.rollback()
+
+    return addresses, unresolved
+
+
+class AddressPrefetcher:
+    """
+    Resolves the address of newly registered users in the background, so the
+    next sync can query their account right away. Concurrent requests for
+    the same vly_user_id share a single lookup.
+    """
+
+    def __init__(self, app, max_workers=ADDRESS_PREFETCH_WORKERS):
+        self.app = app
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='address-prefetch')
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+
+    def submit(self, vly_user_id: str) -> Future:
+        """Future of the resolved address, None if there is none or the lookup failed"""
+        with self._lock:
+            future = self._in_flight.get(vly_user_id)
+            if future is None:
+                future = self._in_flight[vly_user_id] = self._executor.submit(self._resolve, vly_user_id)
+            return future
+
+    def _resolve(self, vly_user_id):
+        try:
+            with self.app.app_context():
+                addresses, _ = resolve_addresses([vly_user_id])
+                return addresses.get(vly_user_id)
+        except Exception as e:
+            logger.error(f"Error resolving address for {vly_user_id}: {str(e)}")
+            return None
+        finally:
+            with self._lock:
+                self._in_flight.pop(vly_user_id, None)
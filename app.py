@@ -1,24 +1,21 @@
 from dotenv import load_dotenv
 import os
+import click
 from flask import Flask, request, session
 import logging
-from sqlalchemy.exc import SQLAlchemyError
 from flask_babel import Babel
 from flask_login import LoginManager
 from models import db, Admin
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from flask_migrate import Migrate, stamp
 
 
 load_dotenv()
-print(f"ADMIN_PASSWORD set: {'ADMIN_PASSWORD' in os.environ}")
-# db = SQLAlchemy()
 
 migrate = Migrate()
 
 # Configure logging
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
@@ -29,41 +26,45 @@ login_manager = LoginManager()
 def get_locale():
     return session.get('lang', 'en')
 
-def create_app():
+def database_url():
+    """DATABASE_URL, or the PostgreSQL URL assembled from the RDS_* variables"""
+    url = os.getenv('DATABASE_URL')
+    if url:
+        return url
+    DB_HOST = os.getenv('RDS_HOSTNAME')
+    DB_PORT = os.getenv('RDS_PORT')
+    DB_NAME = os.getenv('RDS_DB_NAME')
+    DB_USER = os.getenv('RDS_USERNAME')
+    DB_PASSWORD = os.getenv('RDS_PASSWORD')
+    if not all([DB_HOST, DB_PORT, DB_NAME, DB_USER]):
+        logger.error("DATABASE_URL environment variable not set!")
+        raise ValueError("DATABASE_URL or the RDS_* variables must be set")
+    return f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+def create_app(config=None):
+    """
+    Build the Flask app without touching the database. Creating tables, the
+    admin user and the scheduler are separate one-off commands, see
+    register_commands and scheduler.py.
+    """
     flask_app = Flask(__name__)
-    # flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://ueyamamasashi@localhost/postgres'
-    # flask_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-
-    # migrate = Migrate(flask_app, db)
 
     # Configure Flask app
     flask_app.secret_key = os.environ.get("FLASK_SECRET_KEY") or "a secret key"
-    flask_app.debug = True
+    flask_app.debug = os.getenv('FLASK_DEBUG', '0').lower() in ('1', 'true', 'yes')
+    if config:
+        flask_app.config.update(config)
 
     # Initialize Babel
-    babel = Babel(flask_app, locale_selector=get_locale)
+    Babel(flask_app, locale_selector=get_locale)
 
     # Initialize Login Manager
     login_manager.init_app(flask_app)
     login_manager.login_view = 'admin_login'
 
-    # Database configuration with error handling
-    DB_HOST = os.getenv('RDS_HOSTNAME')
-    DB_PORT = os.getenv('RDS_PORT')
-    DB_NAME = os.getenv('RDS_DB_NAME')
-    DB_USER = os.getenv('RDS_USERNAME')
-    DB_PASSWORD = os.getenv('RDS_PASSWORD')
-    try:
-        database_url = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-        if not database_url:
-            logger.error("DATABASE_URL environment variable not set!")
-            raise ValueError("DATABASE_URL must be set")
-        
-        logger.debug(f"Configuring database with URL: {database_url}")
-        
-        # Configure SQLAlchemy
-        flask_app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    # Database configuration, engines connect lazily on first use
+    if 'SQLALCHEMY_DATABASE_URI' not in flask_app.config:
+        flask_app.config["SQLALCHEMY_DATABASE_URI"] = database_url()
         flask_app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
             "pool_size": 5,
             "max_overflow": 2,
@@ -71,79 +72,55 @@ def create_app():
             "pool_recycle": 300,
             "pool_pre_ping": True,
         }
-        flask_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-        
-        db.init_app(flask_app)
-        migrate.init_app(flask_app, db)
-
-        with flask_app.app_context():
-            # Import models and views after app initialization
-            from models import User, Transaction, Admin
-            from views import register_routes
-            from scheduler import run_update_transactions
-            from scheduler import start_scheduler
-            
-            @login_manager.user_loader
-            def load_user(user_id):
-                return Admin.query.get(int(user_id))
-            
-            try:
-
-                # Test database connection
-                db.engine.connect()
-                logger.info("Successfully connected to database")
-                try:
-                    # Create database tables
-                    db.create_all()
-                    logger.info("Database tables created successfully")
-                    
-                    # Remove existing admin if exists
-                    Admin.query.filter_by(username='admin').delete()
-                    db.session.commit()
-                    logger.info("Existing admin user removed")
-                except SQLAlchemyError as e:
-                    logger.error(f"Database operation failed: {str(e)}")
-                    db.session.rollback()
-
-                # Get admin password from environment variable
-                admin_password = os.environ.get('ADMIN_PASSWORD')
-                if not admin_password:
-                    logger.error("ADMIN_PASSWORD environment variable not set!")
-                    raise ValueError("ADMIN_PASSWORD must be set")
-
-                # Create new admin user with environment variable password
-                admin = Admin(username='admin')
-                admin.set_password(admin_password)
-                db.session.add(admin)
-                db.session.commit()
-                logger.info("Default admin user created/reset with environment password")
-                
-                # Start scheduler for a day updates
-                start_scheduler(run_update_transactions)
-                logger.info("Transaction update scheduler started")
-                
-            except SQLAlchemyError as e:
-                logger.error(f"Database error occurred: {str(e)}")
-                raise
-            except Exception as e:
-                logger.error(f"Error during application setup: {str(e)}")
-                raise
-            
-            # Register routes
-            register_routes(flask_app)
-            logger.info("Routes registered successfully")
-    
-    except Exception as e:
-        logger.error(f"Failed to initialize application: {str(e)}")
-        raise
-
-
-    def index():
-        return "Welcome to VlyWallet Leaderboard"
+    flask_app.config.setdefault("SQLALCHEMY_TRACK_MODIFICATIONS", False)
+
+    db.init_app(flask_app)
+    migrate.init_app(flask_app, db)
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return Admin.query.get(int(user_id))
+
+    # Register routes
+    from views import register_routes
+    register_routes(flask_app)
+    register_commands(flask_app)
+    logger.debug("Routes registered successfully")
+
     return flask_app
 
-flask_app = create_app()
+def bootstrap_admin():
+    """Replace the admin user with one using ADMIN_PASSWORD"""
+    admin_password = os.environ.get('ADMIN_PASSWORD')
+    if not admin_password:
+        logger.error("ADMIN_PASSWORD environment variable not set!")
+        raise ValueError("ADMIN_PASSWORD must be set")
+
+    # Remove existing admin if exists
+    Admin.query.filter_by(username='admin').delete()
+    admin = Admin(username='admin')
+    admin.set_password(admin_password)
+    db.session.add(admin)
+    db.session.commit()
+    logger.info("Default admin user created/reset with environment password")
+
+def register_commands(flask_app):
+    @flask_app.cli.command('init-db')
+    def init_db_command():
+        """Create the current schema and stamp it, so `flask db upgrade` starts from here."""
+        db.create_all()
+        stamp()
+        click.echo("Database tables created")
+
+    @flask_app.cli.command('create-admin')
+    def create_admin_command():
+        """Create or reset the admin user from ADMIN_PASSWORD."""
+        bootstrap_admin()
+        click.echo("Admin user created")
+
 
 if __name__ == "__main__":
     logger.info("Starting Flask application...")
-    flask_app.run(host="0.0.0.0", port=5000, debug=True)
+    flask_app = create_app()
+    # Debug mode and the reloader follow FLASK_DEBUG, see create_app
+    flask_app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,154 @@
+"""
+Micro-benchmark for decoding get_account_transactions replies.
+
+Compares the original nested-.get process_transactions with the compiled
+field-path decoder in vly_wallet_api, both for full records and for the
+('Transaction ID', 'Timestamp') projection used when counting. Starting
+from the Candid bytes of a page, it also compares ic-py decoding plus the
+projection with candid_scan, which the count-only sync uses, in time and
+peak allocated memory per page.
+
+    python -m benchmarks.bench_decode --records 200000 --repeat 5
+"""
+import argparse
+import time
+import tracemalloc
+
+from ic.principal import Principal
+
+from ic.candid import decode
+
+from benchmarks.bench_sync import candid_page
+from candid_scan import transaction_ids
+from vly_wallet_api import iter_transactions, process_transactions, QUERY_AMOUNT
+
+COUNT_FIELDS = ('Transaction ID', 'Timestamp')
+
+
+def legacy_process_transactions(data):
+    """process_transactions as it was before the compiled decoder"""
+    transactions = []
+    for item in data:
+        value = item.get('value', {})
+        for key, details in value.items():
+            records = details.get('_3331539157', [])
+            for record in records:
+                record_details = record.get('_1266835934', {})
+                timestamp = record_details.get('_2781795542')
+                operation = record_details.get('_1191829844')
+                amount = record_details.get('_3664621355', [{}])[0].get('_3573748184', 0)
+                sender = (
+                    record_details.get('_3664621355', [{}])[0]
+                    .get('_1136829802', {})
+                    .get('_947296307', None)
+                )
+                receiver = (
+                    record_details.get('_3664621355', [{}])[0]
+                    .get('_25979', {})
+                    .get('_947296307', None)
+                )
+                transactions.append({
+                    'Transaction ID': record.get('_23515'),
+                    'Type': operation,
+                    'Sender': sender,
+                    'Receiver': receiver,
+                    'Amount': amount,
+                    'Timestamp': timestamp
+                })
+    return transactions
+
+
+def synthetic_response(records, start_id=1_000_000, start_ns=1_730_419_200 * 10**9):
+    """A decoded get_account_transactions reply with `records` transfers, newest first"""
+    sender = {'_947296307': Principal.anonymous(), '_1349681965': []}
+    receiver = {'_947296307': Principal.management_canister(), '_1349681965': []}
+    transactions = []
+    for i in range(records, 0, -1):
+        transactions.append({
+            '_23515': start_id + i,
+            '_1266835934': {
+                '_1191829844': 'transfer',
+                '_2781795542': start_ns + i * 60 * 10**9,
+                '_3664621355': [{
+                    '_1136829802': sender,
+                    '_25979': receiver,
+                    '_5094982': [10_000],
+                    '_1213809850': [],
+                    '_3258775938': [],
+                    '_3573748184': 100_000 + i,
+                    '_3868658507': [],
+                }],
+            },
+        })
+    return [{'type': 'rec_13', 'value': {'_17724': {
+        '_596483356': 0,
+        '_3331539157': transactions,
+        '_3582638454': [start_id],
+    }}}]
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--page-size', type=int, default=QUERY_AMOUNT, help="records per Candid page")
+    args = parser.parse_args()
+
+    data = synthetic_response(args.records)
+    assert legacy_process_transactions(data) == process_transactions(data)
+    cutoff_ns = data[0]['value']['_17724']['_3331539157'][args.records // 2]['_1266835934']['_2781795542']
+
+    cases = {
+        'legacy process_transactions': lambda: legacy_process_transactions(data),
+        'process_transactions': lambda: process_transactions(data),
+        'legacy count after cutoff': lambda: sum(
+            1 for tx in legacy_process_transactions(data) if tx['Timestamp'] >= cutoff_ns),
+        'projected count after cutoff': lambda: sum(
+            1 for tx in iter_transactions(data, COUNT_FIELDS) if tx['Timestamp'] >= cutoff_ns),
+    }
+    baseline = None
+    print(f"{args.records} records, best of {args.repeat}")
+    for name, func in cases.items():
+        elapsed = best_of(func, args.repeat)
+        if baseline is None or name.startswith('legacy'):
+            baseline = elapsed
+        print(f"{name:32s} {elapsed * 1000:9.1f} ms  {args.records / elapsed:12,.0f} rec/s  x{baseline / elapsed:.2f}")
+
+    page = candid_page(Principal.anonymous().to_str(),
+                       [(1_000_000 + i, cutoff_ns + i) for i in range(args.page_size, 0, -1)])
+    pages = max(1, args.records // args.page_size)
+    assert transaction_ids(page) == [
+        (tx['Transaction ID'], tx['Timestamp']) for tx in iter_transactions(decode(page), COUNT_FIELDS)]
+    page_cases = {
+        'ic-py decode + projection': lambda: list(iter_transactions(decode(page), COUNT_FIELDS)),
+        'candid_scan.transaction_ids': lambda: transaction_ids(page),
+    }
+    baseline = None
+    print(f"\n{pages} Candid pages of {args.page_size} records ({len(page):,} bytes each), best of {args.repeat}")
+    for name, func in page_cases.items():
+        elapsed = best_of(lambda: [func() for _ in range(pages)], args.repeat) / pages
+        baseline = baseline or elapsed
+        print(f"{name:32s} {elapsed * 1000:9.3f} ms/page  {args.page_size / elapsed:12,.0f} rec/s  "
+              f"x{baseline / elapsed:.2f}  peak {peak_memory(func) / 1024:8.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Load benchmark for the leaderboard routes over a large synthetic dataset.
+
+Logged-in clients drive the app through the WSGI test client from several
+threads and report requests/s and latency percentiles per scenario:
+
+    leaderboard-304       GET /leaderboard revalidated with its ETag
+    leaderboard-cached    GET /leaderboard served from the response cache
+    leaderboard-uncached  GET /leaderboard rendered every time (cache disabled)
+    api-first             GET /api/leaderboard, first page
+    api-deep              GET /api/leaderboard, keyset cursor in the middle of the ranking
+
+It also prints the query plan of every SELECT each scenario runs (EXPLAIN
+QUERY PLAN on SQLite, EXPLAIN ANALYZE on PostgreSQL) and marks full table
+scans; --fail-on-scan turns them into a non-zero exit for CI.
+
+    python -m benchmarks.bench_leaderboard --users 100000
+    python -m benchmarks.bench_leaderboard --database-url postgresql://localhost/vly_bench --users 1000000 --reset
+    python -m benchmarks.bench_leaderboard --database-url postgresql://localhost/vly_bench --skip-generate
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+from sqlalchemy import event, select, func
+
+from benchmarks.datagen import generate
+from benchmarks.bench_sync import percentile
+
+ADMIN_USERNAME = 'bench-admin'
+ADMIN_PASSWORD = 'bench-password-1'
+SCENARIOS = ('leaderboard-304', 'leaderboard-cached', 'leaderboard-uncached', 'api-first', 'api-deep')
+
+
+class NullCache:
+    """Stands in for views.ResponseCache to measure uncached rendering"""
+
+    def get(self, generation, key):
+        return None
+
+    def put(self, generation, key, body):
+        pass
+
+    def clear(self):
+        pass
+
+
+def build_apps(database_url):
+    from app import create_app
+    import views
+
+    config = {'SQLALCHEMY_DATABASE_URI': database_url, 'WTF_CSRF_ENABLED': False}
+    cached = create_app(config)
+    with mock.patch.object(views, 'ResponseCache', NullCache):
+        uncached = create_app(config)
+    return cached, uncached
+
+
+def prepare_data(flask_app, args):
+    from models import db, Admin, Transaction
+
+    with flask_app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        if not args.skip_generate:
+            if db.session.scalar(select(func.count()).select_from(Transaction)):
+                sys.exit("the database already has transactions, use --skip-generate or --reset")
+            started = time.perf_counter()
+            rows = generate(args.users, args.seed,
+                            progress=lambda done: print(f"\rgenerating {done:,} users", end='', flush=True))
+            print(f"\n{rows:,} transaction rows in {time.perf_counter() - started:.1f} s")
+        if not Admin.query.filter_by(username=ADMIN_USERNAME).first():
+            admin = Admin(username=ADMIN_USERNAME)
+            admin.set_password(ADMIN_PASSWORD)
+            db.session.add(admin)
+            db.session.commit()
+
+        rows = db.session.scalar(select(func.count()).select_from(Transaction).where(Transaction.tx_count.isnot(None)))
+        middle = db.session.execute(
+            select(Transaction.tx_count, Transaction.vly_user_id)
+            .where(Transaction.tx_count.isnot(None))
+            .order_by(Transaction.tx_count.desc(), Transaction.vly_user_id)
+            .offset(rows // 2).limit(1)
+        ).first()
+    return {'after_count': middle.tx_count, 'after_user': middle.vly_user_id} if middle else {}
+
+
+def logged_in_client(flask_app):
+    client = flask_app.test_client()
+    client.post('/admin/login', data={'username': ADMIN_USERNAME, 'password': ADMIN_PASSWORD})
+    client.get('/leaderboard')  # consume the login flash
+    return client
+
+
+def scenario_request(name, apps, deep_cursor):
+    """(app, path, query_string, headers factory) of a scenario"""
+    cached, uncached = apps
+    if name == 'leaderboard-304':
+        return cached, '/leaderboard', None, lambda etag: {'If-None-Match': etag}
+    if name == 'leaderboard-cached':
+        return cached, '/leaderboard', None, lambda etag: {}
+    if name == 'leaderboard-uncached':
+        return uncached, '/leaderboard', None, lambda etag: {}
+    if name == 'api-first':
+        return cached, '/api/leaderboard', {'limit': 50}, lambda etag: {}
+    return cached, '/api/leaderboard', dict(deep_cursor, limit=50), lambda etag: {}
+
+
+def capture_statements(flask_app, client, path, query_string, headers):
+    """SELECT statements one request runs, with their parameters"""
+    from models import db
+
+    with flask_app.app_context():
+        engine = db.engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        client.get(path, query_string=query_string, headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return engine, statements
+
+
+def explain(engine, statement, parameters):
+    """Plan lines of one statement and whether it scans a whole table"""
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            rows = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters).all()
+            lines = [row[0] for row in rows]
+            scan = any('Seq Scan' in line for line in lines)
+        else:
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            lines = [row[-1] for row in rows]
+            scan = any(line.startswith('SCAN') and 'USING' not in line for line in lines)
+    return lines, scan
+
+
+def print_plans(name, engine, statements):
+    scans = 0
+    print(f"\nplans for {name}:")
+    for statement, parameters in statements:
+        lines, scan = explain(engine, statement, parameters)
+        scans += scan
+        print(f"  {'!! full scan' if scan else 'ok'}: {' '.join(statement.split())[:160]}")
+        for line in lines:
+            print(f"      {line}")
+    return scans
+
+
+def run_load(flask_app, path, query_string, headers, threads, duration):
+    """Hammer one URL from `threads` logged-in clients for `duration` seconds"""
+    latencies = [[] for _ in range(threads)]
+    statuses = set()
+    clients = [logged_in_client(flask_app) for _ in range(threads)]
+    start_barrier = threading.Barrier(threads + 1)
+
+    def worker(client, samples):
+        start_barrier.wait()
+        deadline = time.perf_counter() + duration
+        while True:
+            started = time.perf_counter()
+            if started >= deadline:
+                return
+            response = client.get(path, query_string=query_string, headers=headers)
+            response.close()
+            samples.append(time.perf_counter() - started)
+            statuses.add(response.status_code)
+
+    workers = [threading.Thread(target=worker, args=(client, samples))
+               for client, samples in zip(clients, latencies)]
+    for thread in workers:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return [s for samples in latencies for s in samples], elapsed, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database-url', help="defaults to a fresh SQLite file")
+    parser.add_argument('--reset', action='store_true', help="drop and recreate all tables first")
+    parser.add_argument('--skip-generate', action='store_true', help="benchmark the data already in the database")
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help="default: all")
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5, help="seconds per scenario")
+    parser.add_argument('--no-plans', action='store_true')
+    parser.add_argument('--fail-on-scan', action='store_true', help="exit 1 if any plan scans a whole table")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    apps = build_apps(database_url)
+    deep_cursor = prepare_data(apps[0], args)
+
+    scans = 0
+    results = []
+    for name in args.scenario or SCENARIOS:
+        flask_app, path, query_string, make_headers = scenario_request(name, apps, deep_cursor)
+        client = logged_in_client(flask_app)
+        etag = client.get(path, query_string=query_string).headers.get('ETag', '').strip('"')
+        headers = make_headers(etag)
+        if not args.no_plans:
+            engine, statements = capture_statements(flask_app, client, path, query_string, headers)
+            scans += print_plans(name, engine, statements)
+        results.append((name,) + run_load(flask_app, path, query_string, headers, args.threads, args.duration))
+
+    print(f"\n{args.threads} threads, {args.duration:g} s per scenario, {database_url.split(':', 1)[0]}")
+    print(f"  {'scenario':<22} {'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}  status")
+    for name, latencies, elapsed, statuses in results:
+        print(f"  {name:<22} {len(latencies) / elapsed:9,.0f} "
+              + ' '.join(f"{percentile(latencies, q) * 1000:8.2f}" for q in (0.5, 0.9, 0.99, 1.0))
+              + f"  {','.join(map(str, sorted(statuses)))}")
+    if args.fail_on_scan and scans:
+        sys.exit(f"{scans} query plan(s) scan a whole table")
+
+
+if __name__ == '__main__':
+    main()
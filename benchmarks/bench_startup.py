@@ -0,0 +1,68 @@
+"""
+Cold-start benchmark for the web app.
+
+Every sample runs in a fresh interpreter and measures the time to import
+app, to build it with create_app() against an in-memory SQLite database,
+and to serve the first request. It also reports which heavy modules were
+loaded along the way, so an import that sneaks back into the web path
+shows up here.
+
+    python -m benchmarks.bench_startup --repeat 10
+    python -m benchmarks.bench_startup --preload vly_wallet_api --preload apscheduler.schedulers.background
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ('ic', 'apscheduler', 'requests', 'httpx', 'numpy', 'gevent')
+
+SAMPLE = """
+import json, sys, time
+preload = {preload!r}
+start = time.perf_counter()
+for module in preload:
+    __import__(module)
+from app import create_app
+imported = time.perf_counter()
+flask_app = create_app({{'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True}})
+created = time.perf_counter()
+response = flask_app.test_client().get({path!r})
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({{
+    'import': imported - start,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'total': served - start,
+    'heavy_modules': [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def sample(preload, path):
+    code = SAMPLE.format(preload=list(preload), path=path, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--path', default='/', help="URL of the first request")
+    parser.add_argument('--preload', action='append', default=[],
+                        help="import this module first, to measure what deferring it saves")
+    args = parser.parse_args()
+
+    samples = [sample(args.preload, args.path) for _ in range(args.repeat)]
+    print(f"{args.repeat} cold starts, first request GET {args.path}")
+    for phase in ('import', 'create_app', 'first_request', 'total'):
+        times = sorted(s[phase] * 1000 for s in samples)
+        print(f"  {phase:<14} median {statistics.median(times):8.1f} ms   min {times[0]:8.1f} ms   "
+              f"max {times[-1]:8.1f} ms")
+    print(f"  heavy modules loaded: {', '.join(samples[0]['heavy_modules']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
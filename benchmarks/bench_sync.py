@@ -0,0 +1,356 @@
+"""
+End-to-end sync benchmark against local stand-ins for the Vly API and the
+IC boundary node.
+
+A generated population of users and wallets is served by forked HTTP
+servers: the user_mapping endpoint answers with each user's principal, and
+/api/v2/canister/<id>/query answers get_account_transactions with CBOR
+envelopes around real Candid replies, paged by start/max_results like the
+ICRC index. The app talks to them through its normal stack (pooled
+sessions, upstream policies, ic-py Agent signing and decoding), so only the
+network is missing. The stand-ins run in their own processes and do not
+compete with the sync for the GIL.
+
+    python -m benchmarks.bench_sync --scale 1k
+    python -m benchmarks.bench_sync --scale 10k --runs 2 --ic-latency-ms 150
+    python -m benchmarks.bench_sync --users 5000 --database-url postgresql://localhost/vly_bench --reset
+    python -m benchmarks.bench_sync --scale 1k --no-db      # vly_wallet_api.main only
+
+Reports users/s, p50/p99 latency per user for the address lookup and the
+canister sync, per-stage totals and peak memory.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import cbor2
+from ic.candid import encode, decode, Types
+from ic.principal import Principal
+from ic.utils import labelHash
+
+SCALES = {'1k': 1_000, '10k': 10_000, '100k': 100_000}
+
+ACCOUNT = Types.Record({'owner': Types.Principal, 'subaccount': Types.Opt(Types.Vec(Types.Nat8))})
+TRANSFER = Types.Record({
+    'to': ACCOUNT,
+    'from': ACCOUNT,
+    'amount': Types.Nat,
+    'fee': Types.Opt(Types.Nat),
+    'memo': Types.Opt(Types.Vec(Types.Nat8)),
+    'created_at_time': Types.Opt(Types.Nat64),
+    'spender': Types.Opt(ACCOUNT),
+})
+TRANSACTION = Types.Record({'kind': Types.Text, 'timestamp': Types.Nat64, 'transfer': Types.Opt(TRANSFER)})
+GET_TRANSACTIONS_RESULT = Types.Variant({
+    'Ok': Types.Record({
+        'balance': Types.Nat,
+        'transactions': Types.Vec(Types.Record({'id': Types.Nat, 'transaction': TRANSACTION})),
+        'oldest_tx_id': Types.Opt(Types.Nat),
+    }),
+    'Err': Types.Record({'message': Types.Text}),
+})
+
+MAX_RESULTS = '_' + str(labelHash('max_results'))
+START = '_' + str(labelHash('start'))
+ACCOUNT_FIELD = '_' + str(labelHash('account'))
+OWNER = '_' + str(labelHash('owner'))
+
+
+class World:
+    """
+    Deterministic users, wallets and histories. Both the stand-in servers
+    and the benchmark derive everything from (users, mean_tx, max_tx, seed).
+    """
+
+    def __init__(self, users, mean_tx, max_tx, no_wallet_every, cutoff):
+        self.users = users
+        self.mean_tx = mean_tx
+        self.max_tx = max_tx
+        self.no_wallet_every = no_wallet_every
+        self.cutoff_ns = int(cutoff) * 10**9
+        self.seed = 0
+
+    def user_id(self, index):
+        return f"bench{index:07d}"
+
+    def index_of(self, user_id):
+        return int(user_id[len('bench'):])
+
+    def has_wallet(self, index):
+        return not (self.no_wallet_every and index % self.no_wallet_every == 0)
+
+    def address(self, index):
+        # Opaque-id principal carrying the user index
+        return Principal(bytes=index.to_bytes(8, 'big') + b'\x01').to_str() if self.has_wallet(index) else None
+
+    def history_size(self, index):
+        rng = random.Random(self.seed * 1_000_003 + index)
+        return min(self.max_tx, int(rng.expovariate(1 / self.mean_tx))) if self.mean_tx else 0
+
+    def history(self, index):
+        """(tx_id, timestamp_ns) newest first; the oldest tenth predates the cutoff"""
+        size = self.history_size(index)
+        older = size // 10
+        return [(index * 10**7 + k, self.cutoff_ns + (k - older) * 3600 * 10**9) for k in range(size, 0, -1)]
+
+
+def make_handler(world, api_latency, ic_latency):
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes, don't let them wait for delayed ACKs
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def reply(self, body, content_type):
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/api/third_party/user_mapping':
+                self.send_error(404)
+                return
+            time.sleep(api_latency)
+            name = parse_qs(url.query).get('name', [''])[0]
+            index = world.index_of(name)
+            address = world.address(index) if 0 <= index < world.users else None
+            self.reply(json.dumps({'data': {'address': address} if address else {}}).encode(), 'application/json')
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            if not self.path.endswith('/query'):
+                self.send_error(404)
+                return
+            time.sleep(ic_latency)
+            request = decode(cbor2.loads(body)['content']['arg'])[0]['value']
+            owner = request[ACCOUNT_FIELD][OWNER]
+            index = int.from_bytes(owner.bytes[:8], 'big')
+            start = request[START]
+            history = world.history(index)
+            if start:
+                history = [tx for tx in history if tx[0] < start[0]]
+            self.reply(cbor2.dumps({'status': 'replied', 'reply': {'arg': candid_page(
+                owner.to_str(), history[:request[MAX_RESULTS]])}}), 'application/cbor')
+
+    return StandInHandler
+
+
+def candid_page(owner, transactions):
+    account = {'owner': owner, 'subaccount': []}
+    counterparty = {'owner': Principal.anonymous().to_str(), 'subaccount': []}
+    records = [{
+        'id': tx_id,
+        'transaction': {
+            'kind': 'transfer',
+            'timestamp': timestamp,
+            'transfer': [{'to': counterparty, 'from': account, 'amount': 1_000_000 + tx_id % 997,
+                          'fee': [10_000], 'memo': [], 'created_at_time': [], 'spender': []}],
+        },
+    } for tx_id, timestamp in transactions]
+    oldest = [transactions[-1][0]] if transactions else []
+    return encode([{'type': GET_TRANSACTIONS_RESULT,
+                    'value': {'Ok': {'balance': 0, 'transactions': records, 'oldest_tx_id': oldest}}}])
+
+
+def start_stand_ins(world, api_latency, ic_latency, processes):
+    """Bind one listening socket and serve it from forked processes"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(world, api_latency, ic_latency))
+    server.daemon_threads = True
+    pids = []
+    for _ in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    server.socket.close()
+    return f"http://127.0.0.1:{server.server_port}", pids
+
+
+def stop_stand_ins(pids):
+    for pid in pids:
+        with contextlib.suppress(ProcessLookupError):
+            os.kill(pid, 15)
+        with contextlib.suppress(ChildProcessError):
+            os.waitpid(pid, 0)
+
+
+class LatencyRecorder:
+    """Wraps a module function and records the wall time of every call"""
+
+    def __init__(self, module, name):
+        self.module = module
+        self.name = name
+        self.original = getattr(module, name)
+        self.samples = []
+
+    def __enter__(self):
+        original, samples = self.original, self.samples
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+
+        setattr(self.module, self.name, timed)
+        return self
+
+    def __exit__(self, *exc):
+        setattr(self.module, self.name, self.original)
+
+
+def percentile(samples, q):
+    if not samples:
+        return float('nan')
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def prepare_database(args, world):
+    from app import create_app
+    from models import db, User
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    flask_app = create_app({'SQLALCHEMY_DATABASE_URI': database_url})
+    with flask_app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        if db.session.scalar(db.select(db.func.count()).select_from(User)):
+            sys.exit(f"{database_url} already has users, use a scratch database or --reset")
+        user_ids = [world.user_id(i) for i in range(world.users)]
+        for start in range(0, len(user_ids), 10_000):
+            db.session.execute(db.insert(User), [{'vly_user_id': u} for u in user_ids[start:start + 10_000]])
+        db.session.commit()
+    return flask_app, database_url
+
+
+def run_once(args, world, flask_app):
+    import vly_wallet_api
+    from metrics import SYNC_STAGE_SECONDS, IC_PAGES
+
+    stages_before = SYNC_STAGE_SECONDS.totals()
+    pages_before = IC_PAGES.value()
+    if args.tracemalloc:
+        tracemalloc.start()
+    output = io.StringIO() if not args.show_output else sys.stdout
+    with LatencyRecorder(vly_wallet_api, 'lookup_vly_wallet_address') as lookups, \
+            LatencyRecorder(vly_wallet_api, 'sync_account') as syncs, \
+            contextlib.redirect_stdout(output):
+        started = time.perf_counter()
+        if flask_app is None:
+            vly_wallet_api.main([world.user_id(i) for i in range(world.users)])
+        else:
+            from update_transactions import update_transactions
+            with flask_app.app_context():
+                update_transactions()
+        elapsed = time.perf_counter() - started
+    traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    if args.tracemalloc:
+        tracemalloc.stop()
+
+    stages = {
+        key[0]: total - stages_before.get(key, (0, 0))[1]
+        for key, (_, total) in SYNC_STAGE_SECONDS.totals().items()
+    }
+    return {
+        'elapsed': elapsed,
+        'lookups': lookups.samples,
+        'syncs': syncs.samples,
+        'pages': IC_PAGES.value() - pages_before,
+        'stages': stages,
+        'traced_peak': traced_peak,
+    }
+
+
+def report(run, result, world):
+    print(f"\nrun {run}: {world.users} users in {result['elapsed']:.2f} s "
+          f"-> {world.users / result['elapsed']:,.0f} users/s, {result['pages']} pages")
+    for name, samples in (('address lookup', result['lookups']), ('canister sync', result['syncs'])):
+        if samples:
+            print(f"  {name:<15} {len(samples):>7} calls   p50 {percentile(samples, 0.5) * 1000:8.1f} ms   "
+                  f"p99 {percentile(samples, 0.99) * 1000:8.1f} ms")
+        else:
+            print(f"  {name:<15} {0:>7} calls")
+    for stage, seconds in sorted(result['stages'].items()):
+        print(f"  stage {stage:<15} {seconds:8.2f} s")
+    if result['traced_peak'] is not None:
+        print(f"  peak traced memory {result['traced_peak'] / 2**20:8.1f} MiB")
+    print(f"  peak RSS so far    {max_rss_mb():8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='1k')
+    parser.add_argument('--users', type=int, help="overrides --scale")
+    parser.add_argument('--mean-tx', type=float, default=20, help="mean transactions per wallet")
+    parser.add_argument('--max-tx', type=int, default=2_000)
+    parser.add_argument('--no-wallet-every', type=int, default=20, help="every Nth user has no ICP address")
+    parser.add_argument('--api-latency-ms', type=float, default=50)
+    parser.add_argument('--ic-latency-ms', type=float, default=100)
+    parser.add_argument('--stand-in-processes', type=int, default=2)
+    parser.add_argument('--vly-rate', type=float, default=1e6,
+                        help="user_mapping requests/s allowed by VLY_API_POLICY (production default 10)")
+    parser.add_argument('--ic-rate', type=float, default=1e6,
+                        help="canister queries/s allowed by IC_QUERY_POLICY (production default 20)")
+    parser.add_argument('--runs', type=int, default=1, help="later runs measure incremental syncs")
+    parser.add_argument('--database-url', help="defaults to a fresh SQLite file")
+    parser.add_argument('--reset', action='store_true', help="drop and recreate all tables first")
+    parser.add_argument('--no-db', action='store_true', help="benchmark vly_wallet_api.main without the database")
+    parser.add_argument('--tracemalloc', action='store_true', help="trace Python allocations (slows the run)")
+    parser.add_argument('--show-output', action='store_true', help="keep the print output of vly_wallet_api")
+    args = parser.parse_args()
+
+    import vly_wallet_api
+    world = World(args.users or SCALES[args.scale], args.mean_tx, args.max_tx, args.no_wallet_every,
+                  vly_wallet_api.CUTOFF_DATE)
+    base_url, pids = start_stand_ins(world, args.api_latency_ms / 1000, args.ic_latency_ms / 1000,
+                                     args.stand_in_processes)
+    try:
+        vly_wallet_api.VLY_API_BASE_URL = base_url
+        vly_wallet_api.IC_BOUNDARY_NODE_URL = base_url
+        for policy, rate in ((vly_wallet_api.VLY_API_POLICY, args.vly_rate),
+                             (vly_wallet_api.IC_QUERY_POLICY, args.ic_rate)):
+            policy.max_rate = policy.bucket.rate = policy.bucket.burst = rate
+
+        flask_app = None
+        target = 'vly_wallet_api.main'
+        if not args.no_db:
+            flask_app, target = prepare_database(args, world)
+        print(f"{world.users} users, mean {args.mean_tx:g} tx per wallet, latency api "
+              f"{args.api_latency_ms:g} ms / ic {args.ic_latency_ms:g} ms, target {target}")
+        print(f"workers: {vly_wallet_api.VLY_API_CONCURRENCY} address lookups, "
+              f"{vly_wallet_api.IC_QUERY_WORKERS} canister queries")
+
+        for run in range(1, args.runs + 1):
+            report(run, run_once(args, world, flask_app), world)
+    finally:
+        stop_stand_ins(pids)
+        vly_wallet_api.close_http_pools()
+
+
+if __name__ == '__main__':
+    main()
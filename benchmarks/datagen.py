@@ -0,0 +1,98 @@
+"""
+Bulk-load synthetic users and transaction rows for benchmarks.
+
+tx_count follows a heavy-tailed distribution with many ties, like the real
+ranking, and a share of users never synced (no transaction row) or synced
+without a count. The leaderboard is rebuilt and the sync generation bumped
+afterwards, so the data looks like it just came out of a sync.
+
+    python -m benchmarks.datagen --users 1000000 --database-url postgresql://localhost/vly_bench --reset
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, text
+from models import db, User, Transaction
+from leaderboard import rebuild_leaderboard, bump_sync_generation
+
+CHUNK_SIZE = 10_000
+
+
+def user_id(index):
+    return f"bench{index:07d}"
+
+
+def synthetic_rows(start, stop, rng, now, unsynced=0.05, no_count=0.01):
+    """(users, transactions) row dicts for user indexes start..stop"""
+    users, transactions = [], []
+    for index in range(start, stop):
+        vly_user_id = user_id(index)
+        users.append({'vly_user_id': vly_user_id})
+        draw = rng.random()
+        if draw < unsynced:
+            continue
+        tx_count = None if draw < unsynced + no_count else min(int(rng.paretovariate(1.1)) - 1, 100_000)
+        transactions.append({
+            'vly_user_id': vly_user_id,
+            'tx_count': tx_count,
+            'last_updated': now - timedelta(seconds=rng.randrange(6 * 3600)),
+            'account': f"acct-{index}",
+            'last_tx_id': index * 10**7 + (tx_count or 0),
+            'amount': round(rng.expovariate(1 / 50), 2),
+            'transaction_frequency': min(tx_count or 0, rng.randrange(8)),
+            'weekly_streak': rng.randrange(12),
+            'last_active_week': None,
+            'points': (tx_count or 0) * 10,
+        })
+    return users, transactions
+
+
+def generate(users, seed=0, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Insert `users` users with their transaction rows in chunks, then
+    rebuild the leaderboard. Must run inside an app context on an empty
+    database. Returns the number of transaction rows.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    rows = 0
+    for start in range(0, users, chunk_size):
+        user_rows, transaction_rows = synthetic_rows(start, min(users, start + chunk_size), rng, now)
+        db.session.execute(insert(User), user_rows)
+        if transaction_rows:
+            db.session.execute(insert(Transaction), transaction_rows)
+        db.session.commit()
+        rows += len(transaction_rows)
+        if progress:
+            progress(min(users, start + chunk_size))
+    rebuild_leaderboard()
+    bump_sync_generation()
+    db.session.commit()
+    # Fresh planner statistics, as autovacuum would eventually collect
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, required=True)
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reset', action='store_true', help="drop and recreate all tables first")
+    args = parser.parse_args()
+
+    from app import create_app
+    flask_app = create_app({'SQLALCHEMY_DATABASE_URI': args.database_url})
+    with flask_app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        rows = generate(args.users, args.seed, progress=lambda done: print(f"\r{done:,} users", end='', flush=True))
+        print(f"\nloaded {args.users:,} users and {rows:,} transaction rows in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
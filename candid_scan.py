@@ -0,0 +1,288 @@
+"""
+Reads (id, timestamp) pairs straight from the Candid bytes of an ICRC index
+get_account_transactions reply, without decoding the records into Python
+objects.
+
+The reply's type table is compiled once into closures that either read a
+wanted field or skip over a value, and the compiled scanner is cached per
+type table, so a page costs one pass over its bytes. Replies whose type
+does not have the expected shape raise CandidScanError; callers fall back
+to the full ic-py decoder.
+"""
+from ic.utils import labelHash
+
+MAGIC = b'DIDL'
+
+OPT, VEC, RECORD, VARIANT = -18, -19, -20, -21
+NULL, BOOL, NAT, INT, TEXT, RESERVED, EMPTY, PRINCIPAL = -1, -2, -3, -4, -15, -16, -17, -24
+FIXED_SIZES = {
+    -5: 1, -6: 2, -7: 4, -8: 8,      # nat8 .. nat64
+    -9: 1, -10: 2, -11: 4, -12: 8,   # int8 .. int64
+    -13: 4, -14: 8,                  # float32, float64
+    BOOL: 1, NULL: 0, RESERVED: 0,
+}
+UNSIGNED_FIXED = (-5, -6, -7, -8)
+
+OK = labelHash('Ok')
+TRANSACTIONS = labelHash('transactions')
+ID = labelHash('id')
+TRANSACTION = labelHash('transaction')
+TIMESTAMP = labelHash('timestamp')
+
+
+class CandidScanError(ValueError):
+    """The reply is not valid Candid or not shaped like GetTransactionsResult"""
+
+
+def _read_leb(data, pos):
+    byte = data[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _read_sleb(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            if byte & 0x40:
+                result -= 1 << shift
+            return result, pos
+
+
+def _skip_leb(data, pos):
+    while data[pos] & 0x80:
+        pos += 1
+    return pos + 1
+
+
+def _skip_blob(data, pos):
+    length, pos = _read_leb(data, pos)
+    return pos + length
+
+
+def _skip_principal(data, pos):
+    if data[pos] != 1:
+        raise CandidScanError("Opaque principal references are not supported")
+    return _skip_blob(data, pos + 1)
+
+
+def _parse_header(data):
+    """(type table, argument types, offset of the first value)"""
+    if data[:4] != MAGIC:
+        raise CandidScanError("Missing DIDL magic")
+    count, pos = _read_leb(data, 4)
+    table = []
+    for _ in range(count):
+        opcode, pos = _read_sleb(data, pos)
+        if opcode in (OPT, VEC):
+            inner, pos = _read_sleb(data, pos)
+            table.append((opcode, inner))
+        elif opcode in (RECORD, VARIANT):
+            length, pos = _read_leb(data, pos)
+            fields = []
+            for _ in range(length):
+                label, pos = _read_leb(data, pos)
+                field_type, pos = _read_sleb(data, pos)
+                fields.append((label, field_type))
+            table.append((opcode, tuple(fields)))
+        else:
+            raise CandidScanError(f"Unsupported type opcode {opcode}")
+    count, pos = _read_leb(data, pos)
+    args = []
+    for _ in range(count):
+        arg, pos = _read_sleb(data, pos)
+        args.append(arg)
+    return table, args, pos
+
+
+class _Compiler:
+    def __init__(self, table):
+        self.table = table
+        self.skippers = {}
+
+    def entry(self, type_id, expected):
+        if type_id < 0 or type_id >= len(self.table) or self.table[type_id][0] != expected:
+            raise CandidScanError(f"Expected type opcode {expected} for type {type_id}")
+        return self.table[type_id][1]
+
+    def skipper(self, type_id):
+        """skip(data, pos) -> position after a value of type_id"""
+        if type_id in self.skippers:
+            return self.skippers[type_id]
+        if type_id < 0:
+            skip = self._primitive_skipper(type_id)
+        else:
+            # Recursive types reach themselves through this placeholder
+            self.skippers[type_id] = lambda data, pos: self.skippers[type_id](data, pos)
+            skip = self._composite_skipper(type_id)
+        self.skippers[type_id] = skip
+        return skip
+
+    def _primitive_skipper(self, type_id):
+        if type_id in (NAT, INT):
+            return _skip_leb
+        if type_id == TEXT:
+            return _skip_blob
+        if type_id == PRINCIPAL:
+            return _skip_principal
+        size = FIXED_SIZES.get(type_id)
+        if size is None:
+            raise CandidScanError(f"Cannot skip values of type {type_id}")
+        return lambda data, pos: pos + size
+
+    def _composite_skipper(self, type_id):
+        opcode, spec = self.table[type_id]
+        if opcode == OPT:
+            inner = self.skipper(spec)
+            return lambda data, pos: inner(data, pos + 1) if data[pos] else pos + 1
+        if opcode == VEC:
+            size = FIXED_SIZES.get(spec)
+            if size is not None:
+                def skip_fixed_vec(data, pos):
+                    length, pos = _read_leb(data, pos)
+                    return pos + length * size
+                return skip_fixed_vec
+            inner = self.skipper(spec)
+
+            def skip_vec(data, pos):
+                length, pos = _read_leb(data, pos)
+                for _ in range(length):
+                    pos = inner(data, pos)
+                return pos
+            return skip_vec
+        fields = [self.skipper(field_type) for _, field_type in spec]
+        if opcode == RECORD:
+            def skip_record(data, pos):
+                for skip in fields:
+                    pos = skip(data, pos)
+                return pos
+            return skip_record
+
+        def skip_variant(data, pos):
+            index, pos = _read_leb(data, pos)
+            return fields[index](data, pos)
+        return skip_variant
+
+    def natural(self, type_id):
+        """read(data, pos) -> (int, pos) for nat and natN values"""
+        if type_id == NAT:
+            return _read_leb
+        if type_id in UNSIGNED_FIXED:
+            size = FIXED_SIZES[type_id]
+            return lambda data, pos: (int.from_bytes(data[pos:pos + size], 'little'), pos + size)
+        raise CandidScanError(f"Expected a natural number type, got {type_id}")
+
+    def field(self, type_id, label, reader):
+        """read(data, pos) -> (value, pos) of one field of a record, skipping the others"""
+        fields = self.entry(type_id, RECORD)
+        labels = [field_label for field_label, _ in fields]
+        if label not in labels:
+            raise CandidScanError(f"Record type {type_id} has no field {label}")
+        index = labels.index(label)
+        before = [self.skipper(field_type) for _, field_type in fields[:index]]
+        read = reader(fields[index][1])
+        after = [self.skipper(field_type) for _, field_type in fields[index + 1:]]
+
+        def read_field(data, pos):
+            for skip in before:
+                pos = skip(data, pos)
+            value, pos = read(data, pos)
+            for skip in after:
+                pos = skip(data, pos)
+            return value, pos
+        return read_field
+
+    def id_and_timestamp(self, type_id):
+        """read(data, pos) -> ((id, timestamp), pos) of a TransactionWithId record"""
+        fields = self.entry(type_id, RECORD)
+        labels = [label for label, _ in fields]
+        if ID not in labels or TRANSACTION not in labels:
+            raise CandidScanError("TransactionWithId needs id and transaction fields")
+        read_id = self.natural(fields[labels.index(ID)][1])
+        read_timestamp = self.field(fields[labels.index(TRANSACTION)][1], TIMESTAMP, self.natural)
+
+        if labels == [ID, TRANSACTION]:
+            def read_pair(data, pos):
+                tx_id, pos = read_id(data, pos)
+                timestamp, pos = read_timestamp(data, pos)
+                return (tx_id, timestamp), pos
+            return read_pair
+
+        steps = [
+            read_id if label == ID else read_timestamp if label == TRANSACTION else self.skipper(field_type)
+            for label, field_type in fields
+        ]
+        slots = [0 if label == ID else 1 if label == TRANSACTION else None for label in labels]
+
+        def read_pair_with_extra_fields(data, pos):
+            values = [None, None]
+            for slot, step in zip(slots, steps):
+                if slot is None:
+                    pos = step(data, pos)
+                else:
+                    values[slot], pos = step(data, pos)
+            return tuple(values), pos
+        return read_pair_with_extra_fields
+
+    def transaction_ids(self, type_id):
+        """scan(data, pos) -> [(id, timestamp), ...] of a GetTransactionsResult"""
+        branches = self.entry(type_id, VARIANT)
+        ok = [index for index, (label, _) in enumerate(branches) if label == OK]
+        if not ok:
+            raise CandidScanError("GetTransactionsResult has no Ok branch")
+        ok = ok[0]
+        vec_type = [field_type for label, field_type in self.entry(branches[ok][1], RECORD) if label == TRANSACTIONS]
+        if not vec_type:
+            raise CandidScanError("GetTransactions has no transactions field")
+        read_row = self.id_and_timestamp(self.entry(vec_type[0], VEC))
+
+        def read_rows(data, pos):
+            length, pos = _read_leb(data, pos)
+            rows = []
+            append = rows.append
+            for _ in range(length):
+                row, pos = read_row(data, pos)
+                append(row)
+            return rows, pos
+        read_ok = self.field(branches[ok][1], TRANSACTIONS, lambda _: read_rows)
+
+        def scan(data, pos):
+            index, pos = _read_leb(data, pos)
+            if index != ok:
+                # Err: no transactions, like the full decoder
+                return []
+            return read_ok(data, pos)[0]
+        return scan
+
+
+_scanners = {}
+
+
+def transaction_ids(data):
+    """
+    [(id, timestamp), ...] of the records in a get_account_transactions
+    reply, newest first as the index returns them. An Err reply gives [].
+    """
+    try:
+        table, args, pos = _parse_header(data)
+        header = bytes(data[:pos])
+        scan = _scanners.get(header)
+        if scan is None:
+            if len(args) != 1:
+                raise CandidScanError(f"Expected one reply value, got {len(args)}")
+            scan = _scanners[header] = _Compiler(table).transaction_ids(args[0])
+        return scan(data, pos)
+    except IndexError:
+        raise CandidScanError("Truncated Candid reply") from None
@@ -0,0 +1,14 @@
+"""
+gunicorn reads this file from the working directory on startup.
+
+Under gevent workers psycopg2 would block the whole worker on every query,
+stalling every /stream connection and page it serves, so its wait callback
+is made cooperative right after the worker is forked.
+"""
+
+
+def post_fork(server, worker):
+    if 'gevent' in server.cfg.worker_class_str:
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+        worker.log.info("psycopg2 patched for gevent")
@@ -0,0 +1,96 @@
+import logging
+from datetime import datetime
+from sqlalchemy import select, insert, update, delete, func, or_
+from models import db, Transaction, LeaderboardEntry, SyncGeneration
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild_leaderboard():
+    """
+    Replace leaderboard_entry with the current ranking by tx_count.
+    Runs inside the caller's database transaction, so readers keep seeing the
+    previous ranking until the caller commits.
+    """
+    score = func.coalesce(Transaction.tx_count, 0)
+    ranked = select(
+        func.row_number().over(order_by=(score.desc(), Transaction.vly_user_id)),
+        Transaction.vly_user_id,
+        score,
+    )
+    db.session.execute(delete(LeaderboardEntry))
+    db.session.execute(
+        insert(LeaderboardEntry).from_select(['rank', 'vly_user_id', 'score'], ranked)
+    )
+    logger.info("Leaderboard rebuilt")
+
+
+def bump_sync_generation():
+    """
+    Advance the sync generation inside the caller's database transaction.
+    Cached leaderboard pages of older generations stop being served once
+    the caller commits.
+    """
+    result = db.session.execute(
+        update(SyncGeneration)
+        .where(SyncGeneration.id == 1)
+        .values(generation=SyncGeneration.generation + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        db.session.add(SyncGeneration(id=1, generation=1))
+        db.session.flush()
+
+
+def current_sync_generation():
+    return db.session.scalar(
+        select(SyncGeneration.generation).where(SyncGeneration.id == 1)
+    ) or 0
+
+
+def last_sync_time():
+    """When the last sync committed, or None if none has yet"""
+    return db.session.scalar(
+        select(SyncGeneration.updated_at).where(SyncGeneration.id == 1)
+    )
+
+
+def top_entries(limit=10):
+    """
+    The first `limit` ranks as dicts with vly_user_id and tx_count, read by
+    primary key range. Falls back to ranking the transaction table directly
+    if the leaderboard has not been built yet.
+    """
+    entries = LeaderboardEntry.query.filter(LeaderboardEntry.rank <= limit) \
+        .order_by(LeaderboardEntry.rank).all()
+    if entries:
+        return [{'vly_user_id': e.vly_user_id, 'tx_count': e.score} for e in entries]
+
+    transactions = Transaction.query.order_by(Transaction.tx_count.desc()).limit(limit).all()
+    return [{'vly_user_id': t.vly_user_id, 'tx_count': t.tx_count} for t in transactions]
+
+
+def ranking_page(after_count=None, after_user=None, limit=50):
+    """
+    One page of the full ranking ordered by (tx_count DESC, vly_user_id),
+    starting after the (after_count, after_user) keyset cursor. Each page is
+    an index range scan on ix_transaction_tx_count_vly_user_id, so deep pages
+    cost the same as the first one. Returns (entries, next_cursor).
+    """
+    query = select(Transaction.vly_user_id, Transaction.tx_count) \
+        .where(Transaction.tx_count.isnot(None)) \
+        .order_by(Transaction.tx_count.desc(), Transaction.vly_user_id) \
+        .limit(limit + 1)
+    if after_count is not None:
+        # tx_count <= after_count bounds the index scan, the OR only filters ties
+        query = query.where(
+            Transaction.tx_count <= after_count,
+            or_(Transaction.tx_count < after_count, Transaction.vly_user_id > (after_user or '')),
+        )
+
+    rows = db.session.execute(query).all()
+    entries = [{'vly_user_id': row.vly_user_id, 'tx_count': row.tx_count} for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = entries[-1]
+        next_cursor = {'after_count': last['tx_count'], 'after_user': last['vly_user_id']}
+    return entries, next_cursor
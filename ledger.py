@@ -0,0 +1,91 @@
+import logging
+from datetime import datetime
+from sqlalchemy import select, func
+from models import db, LedgerEntry
+
+logger = logging.getLogger(__name__)
+
+# Rows per executemany() round trip when writing ledger entries
+LEDGER_BATCH_SIZE = 1000
+
+
+def _principal_text(principal):
+    if principal is None:
+        return None
+    return principal.to_str() if hasattr(principal, 'to_str') else str(principal)
+
+
+def ledger_rows(account, records):
+    """Turn decoded process_transactions records into LedgerEntry column dicts"""
+    return [
+        {
+            'account': account,
+            'tx_id': record['Transaction ID'],
+            'type': record['Type'],
+            'sender': _principal_text(record['Sender']),
+            'receiver': _principal_text(record['Receiver']),
+            'amount': record['Amount'] or 0,
+            # ICRC timestamps are nanoseconds since the epoch
+            'timestamp': datetime.utcfromtimestamp(record['Timestamp'] / 1_000_000_000),
+        }
+        for record in records
+    ]
+
+
+def _insert_ignoring_duplicates(rows):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # No ON CONFLICT support, drop rows that are already stored
+        accounts = {row['account'] for row in rows}
+        stored = set(db.session.execute(
+            select(LedgerEntry.account, LedgerEntry.tx_id).where(LedgerEntry.account.in_(accounts))
+        ).tuples())
+        rows = [row for row in rows if (row['account'], row['tx_id']) not in stored]
+        if rows:
+            db.session.execute(LedgerEntry.__table__.insert(), rows)
+        return
+    statement = insert(LedgerEntry).on_conflict_do_nothing(index_elements=['account', 'tx_id'])
+    db.session.execute(statement, rows)
+
+
+def write_ledger_entries(sync_results):
+    """
+    Store the records collected by sync_accounts(collect_records=True).
+    Entries already in the ledger for the same account and tx_id are skipped.
+    The caller commits.
+    """
+    rows = []
+    for result in sync_results.values():
+        if result is not None and result.records:
+            rows.extend(ledger_rows(result.address, result.records))
+
+    for start in range(0, len(rows), LEDGER_BATCH_SIZE):
+        _insert_ignoring_duplicates(rows[start:start + LEDGER_BATCH_SIZE])
+    logger.info(f"Wrote up to {len(rows)} ledger entries")
+    return len(rows)
+
+
+def account_stats(since=None, until=None, accounts=None):
+    """
+    Per-account transaction count, total amount, number of distinct days with
+    activity and last activity computed from the local ledger, optionally
+    limited to a time window and to some accounts.
+    """
+    query = select(
+        LedgerEntry.account,
+        func.count(LedgerEntry.id).label('tx_count'),
+        func.coalesce(func.sum(LedgerEntry.amount), 0).label('amount'),
+        func.count(func.distinct(func.date(LedgerEntry.timestamp))).label('active_days'),
+        func.max(LedgerEntry.timestamp).label('last_activity'),
+    ).group_by(LedgerEntry.account)
+    if since is not None:
+        query = query.where(LedgerEntry.timestamp >= since)
+    if until is not None:
+        query = query.where(LedgerEntry.timestamp < until)
+    if accounts is not None:
+        query = query.where(LedgerEntry.account.in_(accounts))
+    return {row.account: row for row in db.session.execute(query)}
@@ -70,7 +70,34 @@ class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     vly_user_id = db.Column(db.String(64), db.ForeignKey('user.vly_user_id'), nullable=False)
     tx_count = db.Column(db.Integer, default=0)
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)# テスト用のin-memoryデータベース設定
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # High-water mark: tx_count covers this account up to and including last_tx_id
+    account = db.Column(db.String(128), nullable=True)
+    last_tx_id = db.Column(db.BigInteger, nullable=True)
+    # Points inputs and the score computed by points.update_points
+    amount = db.Column(db.Float, nullable=False, default=0)
+    transaction_frequency = db.Column(db.Integer, nullable=False, default=0)
+    weekly_streak = db.Column(db.Integer, nullable=False, default=0)
+    # streaks.week_index of the latest week with activity
+    last_active_week = db.Column(db.Integer, nullable=True)
+    points = db.Column(db.Integer, nullable=False, default=0)
+
+    user_id = db.synonym('vly_user_id')
+    count = db.synonym('tx_count')
+
+    def calculate_points(self):
+        from points import score_points
+        return int(score_points(
+            [self.tx_count or 0],
+            [self.amount or 0],
+            [self.transaction_frequency or 0],
+            [self.weekly_streak or 0],
+        )[0])
+
+# Serves keyset pagination of the full ranking, see leaderboard.ranking_page
+db.Index('ix_transaction_tx_count_vly_user_id', Transaction.tx_count.desc(), Transaction.vly_user_id)
+
+# テスト用のin-memoryデータベース設定
 # engine = create_engine('sqlite:///:memory:')
 # Session = sessionmaker(bind=engine)
 # session = Session()
@@ -78,3 +105,69 @@ class Transaction(db.Model):
 # データベーステーブルの作成
 # db.create_all(engine)
 
+
+class WalletAddress(db.Model):
+    vly_user_id = db.Column(db.String(64), db.ForeignKey('user.vly_user_id'), primary_key=True)
+    # None means the user_mapping API confirmed the user has no ICP address
+    address = db.Column(db.String(128), nullable=True)
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def is_fresh(self, now, ttl, negative_ttl):
+        max_age = ttl if self.address else negative_ttl
+        return now - self.fetched_at < max_age
+
+class LedgerEntry(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('account', 'tx_id', name='uq_ledger_entry_account_tx_id'),
+        db.Index('ix_ledger_entry_account_timestamp', 'account', 'timestamp'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    account = db.Column(db.String(128), nullable=False)
+    tx_id = db.Column(db.BigInteger, nullable=False)
+    type = db.Column(db.String(32), nullable=True)
+    sender = db.Column(db.String(128), nullable=True, index=True)
+    receiver = db.Column(db.String(128), nullable=True, index=True)
+    amount = db.Column(db.Numeric(38, 0), nullable=False, default=0)
+    timestamp = db.Column(db.DateTime, nullable=False, index=True)
+
+class LeaderboardEntry(db.Model):
+    """Ranking precomputed at the end of each sync, see leaderboard.rebuild_leaderboard"""
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    vly_user_id = db.Column(db.String(64), db.ForeignKey('user.vly_user_id'), nullable=False)
+    score = db.Column(db.Integer, nullable=False, default=0)
+
+class SyncGeneration(db.Model):
+    """Single row counter bumped whenever a sync commits new leaderboard data"""
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    generation = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class SyncRun(db.Model):
+    """
+    One update_transactions run. Users are synced in vly_user_id order and the
+    checkpoint advances with every committed batch, see sync_runs.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True, index=True)
+    total_users = db.Column(db.Integer, nullable=False, default=0)
+    users_done = db.Column(db.Integer, nullable=False, default=0)
+    # Last vly_user_id of the last committed batch
+    last_vly_user_id = db.Column(db.String(64), nullable=True)
+
+class SyncJob(db.Model):
+    """One user to sync in a queued run, claimed by sync_queue workers"""
+    __table_args__ = (
+        db.UniqueConstraint('run_id', 'vly_user_id', name='uq_sync_job_run_id_vly_user_id'),
+        db.Index('ix_sync_job_status_id', 'status', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('sync_run.id'), nullable=False)
+    vly_user_id = db.Column(db.String(64), nullable=False)
+    # pending, running, done or failed
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    claimed_by = db.Column(db.String(128), nullable=True)
+    # A running job whose lease expired is claimed again
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
@@ -0,0 +1,97 @@
+import os
+import logging
+import numpy as np
+from sqlalchemy import select, update, func
+from models import db, Transaction
+from ledger import account_stats
+
+logger = logging.getLogger(__name__)
+
+# Points system, see README
+POINTS_PER_TRANSACTION = 10
+AMOUNT_PER_POINT = 100
+LARGE_TRANSACTION_AMOUNT = 1000
+LARGE_TRANSACTION_BONUS = 50
+POINTS_PER_FREQUENCY = 5
+POINTS_PER_STREAK_WEEK = 25
+
+# Rows per executemany() round trip when writing points
+POINTS_BATCH_SIZE = 1000
+# Ledger amounts are in the token's smallest unit, the amount points count whole tokens
+TOKEN_DECIMALS = int(os.getenv('TOKEN_DECIMALS', '8'))
+
+
+def score_points(count, amount, frequency, weekly_streak):
+    """
+    Score any number of users at once from columnar inputs.
+    Returns an int64 array with one score per position.
+    """
+    count = np.asarray(count, dtype=np.int64)
+    amount = np.asarray(amount, dtype=np.float64)
+    frequency = np.asarray(frequency, dtype=np.int64)
+    weekly_streak = np.asarray(weekly_streak, dtype=np.int64)
+    return (
+        count * POINTS_PER_TRANSACTION
+        + np.floor(amount / AMOUNT_PER_POINT).astype(np.int64)
+        + np.floor(amount / LARGE_TRANSACTION_AMOUNT).astype(np.int64) * LARGE_TRANSACTION_BONUS
+        + frequency * POINTS_PER_FREQUENCY
+        + weekly_streak * POINTS_PER_STREAK_WEEK
+    )
+
+
+def refresh_points_inputs(accounts, since=None):
+    """
+    Set Transaction.amount (whole tokens moved) and transaction_frequency
+    (distinct days with a transaction) of the rows for `accounts` from their
+    ledger entries since `since`. Only rows whose inputs changed are written.
+    The caller commits.
+    """
+    accounts = list(accounts)
+    if not accounts:
+        return 0
+    stats = account_stats(since, accounts=accounts)
+    rows = db.session.execute(select(
+        Transaction.id,
+        Transaction.account,
+        Transaction.amount,
+        Transaction.transaction_frequency,
+    ).where(Transaction.account.in_(accounts))).all()
+
+    updates = []
+    for row in rows:
+        account = stats.get(row.account)
+        amount = float(account.amount) / 10 ** TOKEN_DECIMALS if account else 0.0
+        frequency = account.active_days if account else 0
+        if (row.amount, row.transaction_frequency) != (amount, frequency):
+            updates.append({'id': row.id, 'amount': amount, 'transaction_frequency': frequency})
+    for start in range(0, len(updates), POINTS_BATCH_SIZE):
+        db.session.execute(update(Transaction), updates[start:start + POINTS_BATCH_SIZE])
+    logger.debug(f"Refreshed points inputs of {len(updates)} users from the ledger")
+    return len(updates)
+
+
+def update_points():
+    """
+    Recompute Transaction.points for every row in one vectorized pass and
+    write back only the scores that changed. The caller commits.
+    """
+    rows = db.session.execute(select(
+        Transaction.id,
+        func.coalesce(Transaction.tx_count, 0),
+        func.coalesce(Transaction.amount, 0),
+        func.coalesce(Transaction.transaction_frequency, 0),
+        func.coalesce(Transaction.weekly_streak, 0),
+        func.coalesce(Transaction.points, 0),
+    )).all()
+    if not rows:
+        return 0
+
+    ids, count, amount, frequency, weekly_streak, points = (np.array(column) for column in zip(*rows))
+    scores = score_points(count, amount, frequency, weekly_streak)
+    changed = np.flatnonzero(scores != points.astype(np.int64))
+
+    updates = [{'id': int(ids[i]), 'points': int(scores[i])} for i in changed]
+    for start in range(0, len(updates), POINTS_BATCH_SIZE):
+        db.session.execute(update(Transaction), updates[start:start + POINTS_BATCH_SIZE])
+    logger.info(f"Scored {len(rows)} users, {len(updates)} point totals changed")
+    return len(updates)
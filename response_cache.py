@@ -0,0 +1,34 @@
+import threading
+
+
+class ResponseCache:
+    """
+    In-process cache of rendered response bodies for one sync generation.
+    Entries are keyed by an arbitrary key (e.g. the locale); storing a newer
+    generation drops everything rendered for older ones.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._entries = {}
+
+    def get(self, generation, key):
+        with self._lock:
+            if generation != self._generation:
+                return None
+            return self._entries.get(key)
+
+    def put(self, generation, key, body):
+        with self._lock:
+            if self._generation is not None and generation < self._generation:
+                return
+            if generation != self._generation:
+                self._generation = generation
+                self._entries = {}
+            self._entries[key] = body
+
+    def clear(self):
+        with self._lock:
+            self._generation = None
+            self._entries = {}
@@ -1,39 +1,175 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from models import User
+import os
+import sys
+import time
 import logging
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from apscheduler.schedulers.background import BackgroundScheduler
 
 logger = logging.getLogger(__name__)
 
-def run_update_transactions():
+SYNC_INTERVAL = timedelta(hours=int(os.getenv('SYNC_INTERVAL_HOURS', '6')))
+# PostgreSQL advisory lock keys, any constants unique to this application
+LEADER_LOCK_KEY = int(os.getenv('SCHEDULER_LEADER_LOCK_KEY', '7270010001'))
+SYNC_LOCK_KEY = int(os.getenv('SYNC_LOCK_KEY', '7270010002'))
+# Hand each run to sync_queue workers instead of syncing in this process
+SYNC_QUEUE = os.getenv('SYNC_QUEUE', 'false').lower() in ('1', 'true', 'yes')
+# How often a standby scheduler retries to become leader
+LEADER_RETRY_SECONDS = int(os.getenv('SCHEDULER_LEADER_RETRY_SECONDS', '30'))
+
+
+def _is_postgresql(engine):
+    return engine.dialect.name == 'postgresql'
+
+
+@contextmanager
+def advisory_lock(engine, key):
+    """
+    Try to take a session-level PostgreSQL advisory lock on a dedicated
+    connection. Yields that connection if the lock was acquired, else None.
+    The lock is held until the block exits or the connection's session ends,
+    see holds_advisory_lock. Other databases have no cross-process locks,
+    there the lock is always granted.
+    """
+    connection = engine.connect()
+    try:
+        if not _is_postgresql(engine):
+            yield connection
+            return
+        acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {'key': key}).scalar()
+        connection.commit()
+        try:
+            yield connection if acquired else None
+        finally:
+            if acquired and not connection.invalidated:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': key})
+                connection.commit()
+    finally:
+        connection.close()
+
+
+def holds_advisory_lock(connection, key):
+    """
+    Whether the session of the connection yielded by advisory_lock still
+    holds the lock. Raises if that session is gone, e.g. its backend was
+    killed or its socket dropped, in which case PostgreSQL has released it.
+    """
+    if not _is_postgresql(connection.engine):
+        connection.execute(text("SELECT 1"))
+        return True
+    # Advisory lock keys are split into classid (high 32 bits) and objid (low 32 bits)
+    held = connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND granted"
+        " AND pid = pg_backend_pid() AND objsubid = 1"
+        " AND ((classid::bigint << 32) | objid::bigint) = :key)"
+    ), {'key': key}).scalar()
+    connection.commit()
+    return bool(held)
+
+
+def run_update_transactions(app):
+    """
+    Scheduled job. Runs the sync unless another process already holds the
+    sync lock, so at most one sync runs cluster-wide. With SYNC_QUEUE the
+    run is only queued for the sync_queue workers.
+    """
     from update_transactions import update_transactions
-    from app import create_app
-    app=create_app()
-    logging.info("Updating transaction data...") 
+    from sync_queue import enqueue_sync_run
+    sync = enqueue_sync_run if SYNC_QUEUE else update_transactions
+    logging.info("Updating transaction data...")
     with app.app_context():  # アプリケーションコンテキストを設定
-        update_transactions()
+        from models import db
+        with advisory_lock(db.engine, SYNC_LOCK_KEY) as lock_connection:
+            if lock_connection is None:
+                logger.info("Another process is running the sync, skipping this run")
+                return
+            sync()
     logging.info("Transaction data updated successfully.")
 
-def start_scheduler(run_update_transactions):
+
+def _first_run_time(app):
+    """
+    Run right away when a run was interrupted or the last committed sync is
+    older than the interval
+    """
+    from leaderboard import last_sync_time
+    from sync_runs import unfinished_sync_run
+    with app.app_context():
+        last_sync = last_sync_time()
+        interrupted = unfinished_sync_run() is not None
+    if interrupted or last_sync is None or datetime.utcnow() - last_sync >= SYNC_INTERVAL:
+        return datetime.now()
+    return datetime.now() + (last_sync + SYNC_INTERVAL - datetime.utcnow())
+
+
+def start_scheduler(app):
     scheduler = BackgroundScheduler()
     try:
-        scheduler.add_job(run_update_transactions, 
-                        trigger="interval", 
-                        hours=6,
+        scheduler.add_job(run_update_transactions,
+                        trigger="interval",
+                        seconds=SYNC_INTERVAL.total_seconds(),
+                        args=[app],
+                        next_run_time=_first_run_time(app),
+                        max_instances=1,
+                        coalesce=True,
                         id='update_transactions_job',
-                        name='Update transaction data everyday')
+                        name='Update transaction data')
+        logger.info("Scheduler started successfully")
         scheduler.start()
-
-        if not scheduler.running:
-                scheduler.start()
-                logger.info("Scheduler started successfully")
     except Exception as e:
         logger.error(f"Failed to start scheduler: {e}")
+        raise
+    return scheduler
 
 
-if __name__ == "__main__":
+def main():
+    """
+    Dedicated scheduler process. Any number of these may run; they elect a
+    leader through a PostgreSQL advisory lock and only the leader schedules
+    syncs. Standbys keep retrying and take over when the leader's database
+    session ends.
+    """
     from app import create_app
-    app=create_app()
-    start_scheduler(run_update_transactions)  # スケジューラーを開始
-    print("Scheduler started. Waiting for jobs...")
-    while True:  # スクリプトが終了しないように無限ループ
-            pass
\ No newline at end of file
+    from models import db
+    from metrics import start_metrics_server
+    app = create_app()
+    with app.app_context():
+        engine = db.engine
+    start_metrics_server()
+
+    while True:
+        with advisory_lock(engine, LEADER_LOCK_KEY) as lock_connection:
+            if lock_connection is not None:
+                logger.info("Elected scheduler leader")
+                print("Scheduler started. Waiting for jobs...")
+                scheduler = start_scheduler(app)
+                try:
+                    _hold_leadership(lock_connection)
+                finally:
+                    scheduler.shutdown(wait=False)
+                # Leadership lost, exit and let the process manager restart us
+                sys.exit(1)
+        logger.info(f"Another scheduler is leader, retrying in {LEADER_RETRY_SECONDS}s")
+        time.sleep(LEADER_RETRY_SECONDS)
+
+
+def _hold_leadership(lock_connection):
+    """
+    Block while the session holding the leader lock keeps it. The check runs
+    on that session itself; a fresh pooled connection would still succeed
+    after the lock session died and another scheduler took over.
+    """
+    while True:
+        time.sleep(LEADER_RETRY_SECONDS)
+        try:
+            if not holds_advisory_lock(lock_connection, LEADER_LOCK_KEY):
+                logger.error("Leader lock no longer held, giving up leadership")
+                return
+        except Exception as e:
+            logger.error(f"Lost the leader lock session, giving up leadership: {e}")
+            return
+
+
+if __name__ == "__main__":
+    main()
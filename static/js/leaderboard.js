@@ -4,36 +4,49 @@ let eventSource;
 function setupEventSource() {
     eventSource = new EventSource("/stream");
     
+    // Only entries that changed in the last sync are pushed
     eventSource.addEventListener('transaction_update', function(event) {
         const data = JSON.parse(event.data);
         updateLeaderboardData(data);
     });
 
+    eventSource.addEventListener('leaderboard_remove', function(event) {
+        const data = JSON.parse(event.data);
+        removeLeaderboardEntry('count', data.user_id);
+    });
+
+    // The server could not replay missed updates, fetch the full page
+    eventSource.addEventListener('reload', function() {
+        location.reload();
+    });
+
     eventSource.onerror = function(error) {
+        // The browser reconnects on its own, using the server's retry interval
+        // and Last-Event-ID (a sync generation) so no updates are lost
         console.error("EventSource failed:", error);
-        eventSource.close();
-        // Attempt to reconnect after 5 seconds
-        setTimeout(setupEventSource, 5000);
     };
 }
 
 function updateLeaderboardData(data) {
-    // Update points leaderboard
-    updateLeaderboardEntry('points', data.user_id, data.points);
-    
     // Update transaction count leaderboard
     updateLeaderboardEntry('count', data.user_id, data.count);
     
-    // Update transaction amount leaderboard
-    updateLeaderboardEntry('amount', data.user_id, data.amount);
-    
     // Refresh charts
-    // const pointsData = getLeaderboardData('points');
     const countData = getLeaderboardData('count');
-    // const amountData = getLeaderboardData('amount');
     createLeaderboardCharts(countData);
 }
 
+function removeLeaderboardEntry(type, userId) {
+    const table = document.querySelector(`#${type}Chart`).closest('.card').querySelector('table tbody');
+    for (let row of Array.from(table.rows)) {
+        if (row.cells[1].textContent === userId) {
+            row.remove();
+        }
+    }
+    sortLeaderboardTable(table, 2, type === 'amount');
+    createLeaderboardCharts(getLeaderboardData(type));
+}
+
 function updateLeaderboardEntry(type, userId, value) {
     const table = document.querySelector(`#${type}Chart`).closest('.card').querySelector('table tbody');
     let found = false;
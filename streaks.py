@@ -0,0 +1,85 @@
+import logging
+from datetime import datetime
+from sqlalchemy import select, update
+from models import db, Transaction, LedgerEntry
+
+logger = logging.getLogger(__name__)
+
+# Rows per executemany() round trip when rewriting streaks
+STREAK_BATCH_SIZE = 1000
+
+
+def week_index(moment):
+    """
+    Consecutive number of the ISO week (Monday to Sunday) containing moment,
+    which is a date/datetime or an ICRC timestamp in nanoseconds.
+    Consecutive weeks differ by exactly one.
+    """
+    if isinstance(moment, int):
+        moment = datetime.utcfromtimestamp(moment / 1_000_000_000)
+    if isinstance(moment, datetime):
+        moment = moment.date()
+    # date.min (0001-01-01, ordinal 1) is a Monday
+    return (moment.toordinal() - 1) // 7
+
+
+def advance_streak(last_active_week, weekly_streak, weeks):
+    """
+    Fold newly seen activity weeks into (last_active_week, weekly_streak).
+    Weeks at or before last_active_week are already accounted for.
+    """
+    for week in sorted(set(weeks)):
+        if last_active_week is not None and week <= last_active_week:
+            continue
+        if last_active_week is not None and week == last_active_week + 1:
+            weekly_streak += 1
+        else:
+            weekly_streak = 1
+        last_active_week = week
+    return last_active_week, weekly_streak
+
+
+def expire_streaks(today=None):
+    """
+    Reset the streak of users who missed a whole week. The caller commits.
+    """
+    current_week = week_index(today or datetime.utcnow())
+    result = db.session.execute(
+        update(Transaction)
+        .where(Transaction.last_active_week < current_week - 1, Transaction.weekly_streak > 0)
+        .values(weekly_streak=0)
+    )
+    return result.rowcount
+
+
+def rebuild_weekly_streaks(today=None):
+    """
+    Recompute every streak from scratch out of the ledger table. Only needed
+    after changing the streak rules or repairing data; syncs update streaks
+    incrementally. The caller commits.
+    """
+    states = {}
+    query = select(LedgerEntry.account, LedgerEntry.timestamp) \
+        .order_by(LedgerEntry.account, LedgerEntry.timestamp)
+    for account, timestamp in db.session.execute(query).yield_per(10_000):
+        last_active_week, weekly_streak = states.get(account, (None, 0))
+        states[account] = advance_streak(last_active_week, weekly_streak, [week_index(timestamp)])
+
+    rows = db.session.execute(select(Transaction.id, Transaction.account)).all()
+    updates = []
+    for row in rows:
+        last_active_week, weekly_streak = states.get(row.account, (None, 0))
+        updates.append({'id': row.id, 'last_active_week': last_active_week, 'weekly_streak': weekly_streak})
+    for start in range(0, len(updates), STREAK_BATCH_SIZE):
+        db.session.execute(update(Transaction), updates[start:start + STREAK_BATCH_SIZE])
+    expire_streaks(today)
+    logger.info(f"Rebuilt weekly streaks for {len(updates)} users from {len(states)} ledger accounts")
+    return len(updates)
+
+
+if __name__ == "__main__":
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        rebuild_weekly_streaks()
+        db.session.commit()
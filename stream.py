@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from models import LeaderboardEntry
+from leaderboard import current_sync_generation
+
+logger = logging.getLogger(__name__)
+
+# How often the publisher checks for a new sync generation
+STREAM_POLL_SECONDS = float(os.getenv('STREAM_POLL_SECONDS', '5'))
+# Idle connections get a comment line this often so proxies keep them open
+STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', '25'))
+# Ranks watched for changes, matches the table on /leaderboard
+STREAM_TOP_N = int(os.getenv('STREAM_TOP_N', '10'))
+
+
+class EventBroadcaster:
+    """
+    Fan-out of server-sent events from one publisher to many subscribers.
+    Events are kept in a short history of per-generation batches instead of
+    per-subscriber queues, so an idle subscriber costs nothing but its wait
+    on the shared condition.
+
+    Event ids are sync generations, which every worker process reads from
+    the same database, so a client reconnecting to another worker resumes
+    with a Last-Event-ID that means the same thing there.
+    """
+
+    def __init__(self, history=256):
+        self._condition = threading.Condition()
+        self._batches = deque(maxlen=history)
+        self._generation = None
+
+    @property
+    def generation(self):
+        with self._condition:
+            return self._generation
+
+    def publish(self, previous, generation, events):
+        """
+        Record the (event, data) pairs that take a client from the previous
+        sync generation to this one and wake every subscriber once. Batches
+        without events are kept too, so replays can bridge them.
+        """
+        with self._condition:
+            self._batches.append((previous, generation, list(events)))
+            self._generation = generation
+            self._condition.notify_all()
+
+    def wait(self, after_generation, timeout):
+        """
+        (generation, events) that bring a client at after_generation up to
+        date, blocking up to timeout seconds while it already is. Returns
+        None if this process cannot replay from after_generation: the client
+        fell behind the kept history or the publisher here skipped it.
+        """
+        with self._condition:
+            if self._generation is None or after_generation >= self._generation:
+                self._condition.wait(timeout)
+            # A client ahead of this process waits for the publisher to catch up
+            if self._generation is None or after_generation >= self._generation:
+                return after_generation, []
+            generation, events = after_generation, []
+            for previous, batch_generation, batch in self._batches:
+                if previous == generation:
+                    generation = batch_generation
+                    events += batch
+            if generation != self._generation:
+                return None
+            return generation, events
+
+
+def leaderboard_delta(previous, current):
+    """
+    Compare two {vly_user_id: (rank, count)} snapshots and return the
+    leaderboard_remove events for users that dropped out, then the
+    transaction_update events for entries that changed. Removals go first
+    so a full table has room for the users that replaced them.
+    """
+    events = [
+        ('leaderboard_remove', {'user_id': vly_user_id})
+        for vly_user_id in previous if vly_user_id not in current
+    ]
+    events += [
+        ('transaction_update', {'user_id': vly_user_id, 'rank': rank, 'count': count})
+        for vly_user_id, (rank, count) in sorted(current.items(), key=lambda item: item[1][0])
+        if previous.get(vly_user_id) != (rank, count)
+    ]
+    return events
+
+
+class LeaderboardPublisher:
+    """
+    Single background thread per process that watches the sync generation
+    and publishes only the leaderboard entries that changed. Works whether
+    the sync ran in this process or in the scheduler process.
+    """
+
+    def __init__(self, app, broadcaster, poll_interval=STREAM_POLL_SECONDS, top_n=STREAM_TOP_N):
+        self.app = app
+        self.broadcaster = broadcaster
+        self.poll_interval = poll_interval
+        self.top_n = top_n
+        self._generation = None
+        self._snapshot = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                # Subscribers need the current generation to start from
+                self.poll()
+                self._thread = threading.Thread(target=self._run, name='leaderboard-publisher', daemon=True)
+                self._thread.start()
+
+    def snapshot(self):
+        entries = LeaderboardEntry.query.filter(LeaderboardEntry.rank <= self.top_n).all()
+        return {e.vly_user_id: (e.rank, e.score) for e in entries}
+
+    def poll(self):
+        """Publish the delta if a new sync generation was committed"""
+        with self.app.app_context():
+            generation = current_sync_generation()
+            if generation == self._generation:
+                return
+            snapshot = self.snapshot()
+        # The first poll only records the state clients already rendered
+        events = [] if self._generation is None else leaderboard_delta(self._snapshot, snapshot)
+        self.broadcaster.publish(self._generation, generation, events)
+        if events:
+            logger.info(f"Published {len(events)} leaderboard changes for generation {generation}")
+        self._generation = generation
+        self._snapshot = snapshot
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Leaderboard publisher error: {str(e)}")
+            time.sleep(self.poll_interval)
+
+
+def event_stream(broadcaster, last_event_id=None, heartbeat=STREAM_HEARTBEAT_SECONDS):
+    """
+    Generator of text/event-stream chunks for one subscriber. The id of a
+    generation follows its last event, so a client that drops mid-batch
+    resumes from the previous generation and replays the whole batch;
+    applying the events again leaves the table the same.
+    """
+    generation = broadcaster.generation if last_event_id is None else last_event_id
+    yield f"retry: 5000\nid: {generation}\n\n"
+    while True:
+        replay = broadcaster.wait(generation, heartbeat)
+        if replay is None:
+            # Cannot replay from the client's generation, let the page reload itself
+            generation = broadcaster.generation
+            yield f"id: {generation}\nevent: reload\ndata: {{}}\n\n"
+            continue
+        latest, events = replay
+        if latest == generation:
+            yield ": keep-alive\n\n"
+            continue
+        for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        yield f"id: {latest}\n\n"
+        generation = latest
@@ -0,0 +1,166 @@
+import os
+import time
+import socket
+import logging
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, update, func, literal, or_, and_
+from models import db, User, SyncRun, SyncJob
+from sync_runs import start_sync_run, unfinished_sync_run
+from update_transactions import sync_user_batch, finish_sync
+from metrics import SYNC_STAGE_SECONDS, start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+# Users claimed per worker round trip
+SYNC_JOB_BATCH_SIZE = int(os.getenv('SYNC_JOB_BATCH_SIZE', '100'))
+# A claimed batch must be written within this time or other workers take it over
+SYNC_JOB_LEASE = timedelta(seconds=int(os.getenv('SYNC_JOB_LEASE_SECONDS', '600')))
+SYNC_JOB_MAX_ATTEMPTS = int(os.getenv('SYNC_JOB_MAX_ATTEMPTS', '3'))
+# How long an idle worker waits before polling for new jobs
+SYNC_WORKER_IDLE_SECONDS = float(os.getenv('SYNC_WORKER_IDLE_SECONDS', '10'))
+
+
+def enqueue_sync_run(now=None):
+    """
+    Start a run with one pending job per user. An unfinished run is reused;
+    if it was started by the serial update_transactions, only the users
+    after its checkpoint are queued.
+    """
+    run = unfinished_sync_run()
+    if run is not None and db.session.scalar(select(SyncJob.id).where(SyncJob.run_id == run.id).limit(1)):
+        logger.info(f"Sync run {run.id} is already queued")
+        return run
+    run = run or start_sync_run(now)
+
+    users = select(literal(run.id), User.vly_user_id)
+    if run.last_vly_user_id is not None:
+        users = users.where(User.vly_user_id > run.last_vly_user_id)
+    db.session.execute(insert(SyncJob).from_select(['run_id', 'vly_user_id'], users))
+    db.session.commit()
+    logger.info(f"Queued sync run {run.id}")
+    # A run without users has nothing for workers to finish
+    finish_run_if_complete(run.id)
+    return run
+
+
+def claim_jobs(worker_id, batch_size=None, now=None):
+    """
+    Claim up to batch_size pending jobs, or running jobs whose lease
+    expired. Rows locked by other claimers are skipped, so any number of
+    workers can claim concurrently without waiting on each other.
+    """
+    now = now or datetime.utcnow()
+    expired = and_(SyncJob.status == 'running', SyncJob.lease_expires_at < now)
+    # Give up on jobs that keep taking their worker down
+    db.session.execute(
+        update(SyncJob)
+        .where(expired, SyncJob.attempts >= SYNC_JOB_MAX_ATTEMPTS)
+        .values(status='failed')
+    )
+    jobs = db.session.scalars(
+        select(SyncJob)
+        .where(or_(SyncJob.status == 'pending', expired))
+        .order_by(SyncJob.id)
+        .limit(batch_size or SYNC_JOB_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+    ).all()
+    for job in jobs:
+        job.status = 'running'
+        job.claimed_by = worker_id
+        job.lease_expires_at = now + SYNC_JOB_LEASE
+        job.attempts += 1
+    db.session.commit()
+    return jobs
+
+
+def process_jobs(jobs):
+    """
+    Sync the claimed users and mark their jobs done in one transaction. On
+    failure the jobs go back to pending until they run out of attempts.
+    """
+    vly_user_ids = [job.vly_user_id for job in jobs]
+    try:
+        sync_user_batch(vly_user_ids, datetime.utcnow())
+        for job in jobs:
+            job.status = 'done'
+            job.lease_expires_at = None
+        for run_id, count in _count_by_run(jobs).items():
+            db.session.execute(
+                update(SyncRun)
+                .where(SyncRun.id == run_id)
+                .values(users_done=SyncRun.users_done + count, updated_at=datetime.utcnow())
+            )
+        with SYNC_STAGE_SECONDS.time(stage='commit'):
+            db.session.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error syncing claimed users: {str(e)}")
+        db.session.rollback()
+        for job in jobs:
+            job.status = 'failed' if job.attempts >= SYNC_JOB_MAX_ATTEMPTS else 'pending'
+            job.lease_expires_at = None
+        db.session.commit()
+        return False
+
+
+def _count_by_run(jobs):
+    counts = {}
+    for job in jobs:
+        counts[job.run_id] = counts.get(job.run_id, 0) + 1
+    return counts
+
+
+def finish_run_if_complete(run_id):
+    """
+    Rebuild derived data once no job of the run is left. The run row is
+    locked so only one of the workers racing here finishes it.
+    """
+    run = db.session.scalar(
+        select(SyncRun).where(SyncRun.id == run_id, SyncRun.finished_at.is_(None)).with_for_update()
+    )
+    remaining = run is not None and db.session.scalar(
+        select(func.count()).select_from(SyncJob)
+        .where(SyncJob.run_id == run_id, SyncJob.status.in_(['pending', 'running']))
+    )
+    if run is None or remaining:
+        db.session.rollback()
+        return False
+    return finish_sync(run)
+
+
+def run_worker(worker_id=None, batch_size=None, once=False):
+    """
+    Claim and process batches until the queue is empty, then poll for new
+    runs. With once=True, return when there is nothing left to claim.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Sync worker {worker_id} started")
+    while True:
+        jobs = claim_jobs(worker_id, batch_size)
+        if not jobs:
+            if once:
+                return
+            time.sleep(SYNC_WORKER_IDLE_SECONDS)
+            continue
+        run_ids = set(_count_by_run(jobs))
+        process_jobs(jobs)
+        for run_id in run_ids:
+            finish_run_if_complete(run_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Queue-based transaction sync")
+    parser.add_argument('command', choices=['worker', 'enqueue'])
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--once', action='store_true', help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()  # アプリケーションを作成
+    with app.app_context():
+        if args.command == 'enqueue':
+            enqueue_sync_run()
+        else:
+            start_metrics_server()
+            run_worker(batch_size=args.batch_size, once=args.once)
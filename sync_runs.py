@@ -0,0 +1,86 @@
+import os
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import select, func
+from models import db, User, SyncRun
+from metrics import SYNC_LAST_SUCCESS, SYNC_RUN_USERS_DONE, SYNC_RUN_USERS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Users synced and committed together, an interrupted run loses at most one batch
+SYNC_BATCH_SIZE = int(os.getenv('SYNC_BATCH_SIZE', '500'))
+
+
+def unfinished_sync_run():
+    return db.session.scalar(
+        select(SyncRun).where(SyncRun.finished_at.is_(None)).order_by(SyncRun.id.desc()).limit(1)
+    )
+
+
+def start_sync_run(now=None):
+    """
+    The unfinished run to resume, or a new committed run covering every
+    user registered right now.
+    """
+    run = unfinished_sync_run()
+    if run is not None:
+        logger.info(f"Resuming sync run {run.id} after {run.users_done}/{run.total_users} users")
+        return run
+
+    now = now or datetime.utcnow()
+    total_users = db.session.scalar(select(func.count()).select_from(User))
+    run = SyncRun(started_at=now, updated_at=now, total_users=total_users)
+    db.session.add(run)
+    db.session.commit()
+    logger.info(f"Started sync run {run.id} for {total_users} users")
+    return run
+
+
+def next_user_batch(run, batch_size=None):
+    """The next vly_user_ids after the run's checkpoint, in vly_user_id order"""
+    query = select(User.vly_user_id).order_by(User.vly_user_id).limit(batch_size or SYNC_BATCH_SIZE)
+    if run.last_vly_user_id is not None:
+        query = query.where(User.vly_user_id > run.last_vly_user_id)
+    return list(db.session.scalars(query))
+
+
+def checkpoint_sync_run(run, vly_user_ids, now=None):
+    """Advance the checkpoint inside the caller's transaction, so it commits with the batch"""
+    run.last_vly_user_id = vly_user_ids[-1]
+    run.users_done += len(vly_user_ids)
+    run.updated_at = now or datetime.utcnow()
+
+
+def finish_sync_run(run, now=None):
+    run.finished_at = run.updated_at = now or datetime.utcnow()
+
+
+def sync_progress():
+    """Progress of the latest run as a JSON-ready dict, None before the first run"""
+    run = db.session.scalar(select(SyncRun).order_by(SyncRun.id.desc()).limit(1))
+    if run is None:
+        return None
+    return {
+        'id': run.id,
+        'status': 'finished' if run.finished_at else 'running',
+        # Users registered during the run are synced too
+        'total_users': max(run.total_users, run.users_done),
+        'users_done': run.users_done,
+        'started_at': run.started_at.isoformat(),
+        'updated_at': run.updated_at.isoformat(),
+        'finished_at': run.finished_at.isoformat() if run.finished_at else None,
+    }
+
+
+def update_sync_gauges():
+    """
+    Set the sync gauges from the database, so any process can report syncs
+    that ran in the scheduler or the queue workers
+    """
+    last_finished = db.session.scalar(select(func.max(SyncRun.finished_at)))
+    if last_finished is not None:
+        SYNC_LAST_SUCCESS.set(last_finished.replace(tzinfo=timezone.utc).timestamp())
+    progress = sync_progress()
+    if progress is not None:
+        SYNC_RUN_USERS_DONE.set(progress['users_done'])
+        SYNC_RUN_USERS_TOTAL.set(progress['total_users'])
@@ -0,0 +1,109 @@
+"""Fixtures shared by the test modules"""
+import unittest
+
+from flask import Flask
+from ic.candid import decode, encode, Types
+from ic.principal import Principal
+from ic.utils import labelHash
+
+from models import db
+
+
+def make_app(**options):
+    """Flask app bound to a fresh in-memory SQLite database with the schema created"""
+    app = Flask(__name__, **options)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Runs each test inside an app context of its own in-memory database"""
+
+    def create_app(self):
+        return make_app()
+
+    def setUp(self):
+        self.app = self.create_app()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+
+def make_response(records):
+    """Build a decoded get_account_transactions reply shaped like ic-py's output"""
+    transactions = [
+        {
+            '_23515': tx_id,
+            '_1266835934': {
+                '_1191829844': 'transfer',
+                '_2781795542': timestamp,
+                '_3664621355': [{
+                    '_1136829802': {'_947296307': Principal.anonymous(), '_1349681965': []},
+                    '_25979': {'_947296307': Principal.management_canister(), '_1349681965': []},
+                    '_3573748184': 100,
+                }],
+            },
+        }
+        for tx_id, timestamp in records
+    ]
+    return [{'type': 'rec', 'value': {'_17724': {'_3331539157': transactions, '_596483356': 0}}}]
+
+
+ACCOUNT_TYPE = Types.Record({'owner': Types.Principal, 'subaccount': Types.Opt(Types.Vec(Types.Nat8))})
+GET_TRANSACTIONS_RESULT = Types.Variant({
+    'Ok': Types.Record({
+        'balance': Types.Nat,
+        'transactions': Types.Vec(Types.Record({
+            'id': Types.Nat,
+            'transaction': Types.Record({
+                'kind': Types.Text,
+                'timestamp': Types.Nat64,
+                'transfer': Types.Opt(Types.Record({'from': ACCOUNT_TYPE, 'to': ACCOUNT_TYPE, 'amount': Types.Nat})),
+            }),
+        })),
+        'oldest_tx_id': Types.Opt(Types.Nat),
+    }),
+    'Err': Types.Record({'message': Types.Text}),
+})
+
+
+def encode_response(records):
+    """Candid bytes of the get_account_transactions reply that make_response decodes to"""
+    account = {'owner': Principal.anonymous().to_str(), 'subaccount': []}
+    transactions = [
+        {'id': tx_id, 'transaction': {'kind': 'transfer', 'timestamp': timestamp,
+                                      'transfer': [{'from': account, 'to': account, 'amount': 100}]}}
+        for tx_id, timestamp in records
+    ]
+    oldest = [records[-1][0]] if records else []
+    return encode([{'type': GET_TRANSACTIONS_RESULT,
+                    'value': {'Ok': {'balance': 0, 'transactions': transactions, 'oldest_tx_id': oldest}}}])
+
+
+class FakeIndexAgent:
+    """Serves an account history newest-first, honouring max_results and the start cursor"""
+
+    def __init__(self, records):
+        self.records = sorted(records, reverse=True)
+        self.calls = []
+
+    def _page(self, arg):
+        request = decode(arg)[0]['value']
+        max_results = request['_' + str(labelHash('max_results'))]
+        start = request['_' + str(labelHash('start'))]
+        self.calls.append((max_results, start))
+        records = [r for r in self.records if not start or r[0] < start[0]]
+        return records[:max_results]
+
+    def query_raw(self, canister_id, method_name, arg):
+        return make_response(self._page(arg))
+
+    def query_reply(self, canister_id, method_name, arg):
+        return encode_response(self._page(arg))
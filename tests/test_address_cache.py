@@ -0,0 +1,73 @@
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from models import db, User, WalletAddress
+import address_cache
+from tests.helpers import DatabaseTestCase, make_app
+
+
+class TestAddressCache(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        for vly_user_id in ['fresh', 'stale', 'negative', 'new']:
+            db.session.add(User(vly_user_id=vly_user_id))
+        now = datetime(2024, 12, 1)
+        self.now = now
+        db.session.add(WalletAddress(vly_user_id='fresh', address='addr-fresh', fetched_at=now - timedelta(hours=1)))
+        db.session.add(WalletAddress(vly_user_id='stale', address='addr-old', fetched_at=now - timedelta(days=30)))
+        db.session.add(WalletAddress(vly_user_id='negative', address=None, fetched_at=now - timedelta(hours=1)))
+        db.session.commit()
+
+    def test_only_stale_and_missing_entries_are_fetched(self):
+        fetch = mock.Mock(return_value=({'stale': 'addr-new', 'new': None}, []))
+        with mock.patch.object(address_cache, 'fetch_vly_wallet_addresses', fetch):
+            addresses, failed = address_cache.resolve_addresses(['fresh', 'stale', 'negative', 'new'], self.now)
+
+        fetch.assert_called_once_with(['stale', 'new'])
+        self.assertEqual(addresses, {'fresh': 'addr-fresh', 'stale': 'addr-new', 'negative': None, 'new': None})
+        self.assertEqual(failed, [])
+        new_entry = db.session.get(WalletAddress, 'new')
+        self.assertIsNone(new_entry.address)
+        self.assertEqual(new_entry.fetched_at, self.now)
+
+    def test_failed_lookups_keep_previous_value(self):
+        fetch = mock.Mock(return_value=({}, ['stale', 'new']))
+        with mock.patch.object(address_cache, 'fetch_vly_wallet_addresses', fetch):
+            addresses, failed = address_cache.resolve_addresses(['stale', 'new'], self.now)
+
+        self.assertEqual(addresses, {'stale': 'addr-old', 'new': None})
+        self.assertEqual(failed, ['new'])
+        self.assertIsNone(db.session.get(WalletAddress, 'new'))
+        self.assertEqual(db.session.get(WalletAddress, 'stale').fetched_at, self.now - timedelta(days=30))
+
+
+class TestAddressPrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.app = make_app()
+        with self.app.app_context():
+            db.session.add(User(vly_user_id='alice'))
+            db.session.commit()
+
+    def test_concurrent_requests_share_one_lookup_and_store_it(self):
+        release = threading.Event()
+
+        def fetch(vly_user_ids):
+            release.wait(5)
+            return {vly_user_id: 'addr-alice' for vly_user_id in vly_user_ids}, []
+
+        prefetcher = address_cache.AddressPrefetcher(self.app, max_workers=2)
+        with mock.patch.object(address_cache, 'fetch_vly_wallet_addresses', side_effect=fetch) as fetched:
+            futures = [prefetcher.submit('alice') for _ in range(3)]
+            release.set()
+            results = [future.result(5) for future in futures]
+
+        self.assertEqual(results, ['addr-alice'] * 3)
+        self.assertEqual(fetched.call_count, 1)
+        with self.app.app_context():
+            self.assertEqual(db.session.get(WalletAddress, 'alice').address, 'addr-alice')
+
+    def test_failures_resolve_to_none(self):
+        prefetcher = address_cache.AddressPrefetcher(self.app)
+        with mock.patch.object(address_cache, 'fetch_vly_wallet_addresses', side_effect=RuntimeError("boom")):
+            self.assertIsNone(prefetcher.submit('alice').result(5))
@@ -1,17 +1,18 @@
 import unittest
 import os
 from app import create_app
-from database import db
-from models import Admin
+from models import db, Admin
 
 class TestApp(unittest.TestCase):
     def setUp(self):
         # Set test environment variables
         os.environ['ADMIN_PASSWORD'] = 'test_password123'
         
-        self.app = create_app()
-        self.app.config['TESTING'] = True
-        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'WTF_CSRF_ENABLED': False,
+        })
         self.client = self.app.test_client()
         
         with self.app.app_context():
@@ -36,3 +37,15 @@ class TestApp(unittest.TestCase):
             'password': 'test_password123'
         })
         self.assertEqual(response.status_code, 302)  # Redirect after successful login
+
+    def test_create_admin_command(self):
+        with self.app.app_context():
+            db.drop_all()
+        runner = self.app.test_cli_runner()
+
+        self.assertIn("Database tables created", runner.invoke(args=['init-db']).output)
+        result = runner.invoke(args=['create-admin'])
+
+        self.assertIn("Admin user created", result.output)
+        with self.app.app_context():
+            self.assertTrue(Admin.query.filter_by(username='admin').one().check_password('test_password123'))
@@ -0,0 +1,54 @@
+import unittest
+
+from ic.candid import encode, Types
+from ic.principal import Principal
+
+from candid_scan import transaction_ids, CandidScanError
+from tests.helpers import ACCOUNT_TYPE, GET_TRANSACTIONS_RESULT, encode_response
+
+
+class TestTransactionIds(unittest.TestCase):
+    def test_reads_ids_and_timestamps_newest_first(self):
+        records = [(300 + i, 2**63 + i) for i in range(100, 0, -1)]
+
+        self.assertEqual(transaction_ids(encode_response(records)), records)
+
+    def test_empty_page_and_err_reply(self):
+        err = encode([{'type': GET_TRANSACTIONS_RESULT, 'value': {'Err': {'message': 'no such account'}}}])
+
+        self.assertEqual(transaction_ids(encode_response([])), [])
+        self.assertEqual(transaction_ids(err), [])
+
+    def test_skips_unknown_fields_of_any_type(self):
+        result = Types.Variant({
+            'Ok': Types.Record({
+                'transactions': Types.Vec(Types.Record({
+                    'id': Types.Nat64,
+                    'transaction': Types.Record({
+                        'timestamp': Types.Nat,
+                        'memo': Types.Opt(Types.Vec(Types.Nat8)),
+                        'spender': Types.Opt(ACCOUNT_TYPE),
+                        'fee': Types.Float64,
+                        'kind': Types.Text,
+                    }),
+                    'note': Types.Vec(Types.Text),
+                })),
+            }),
+        })
+        spender = {'owner': Principal.anonymous().to_str(), 'subaccount': [[1] * 32]}
+        data = encode([{'type': result, 'value': {'Ok': {'transactions': [
+            {'id': 2, 'transaction': {'timestamp': 2**70, 'memo': [[7] * 300], 'spender': [spender],
+                                      'fee': 0.5, 'kind': 'approve'}, 'note': ['a', 'b']},
+            {'id': 1, 'transaction': {'timestamp': 10, 'memo': [], 'spender': [], 'fee': 0.0,
+                                      'kind': 'mint'}, 'note': []},
+        ]}}}])
+
+        self.assertEqual(transaction_ids(data), [(2, 2**70), (1, 10)])
+
+    def test_rejects_other_shapes_and_truncated_replies(self):
+        data = encode_response([(1, 10), (2, 20)])
+        not_a_result = encode([{'type': Types.Record({'balance': Types.Nat}), 'value': {'balance': 1}}])
+
+        for bad in (b'', b'XXXX' + data[4:], data[:-3], not_a_result):
+            with self.assertRaises(CandidScanError):
+                transaction_ids(bad)
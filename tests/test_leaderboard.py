@@ -0,0 +1,128 @@
+import unittest
+from flask_babel import Babel
+from flask_login import LoginManager
+from models import db, User, Transaction, LeaderboardEntry, Admin
+from response_cache import ResponseCache
+from views import register_routes
+import leaderboard
+from tests.helpers import DatabaseTestCase, make_app
+
+
+class TestLeaderboard(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        for vly_user_id, tx_count in [('carol', 5), ('alice', 9), ('bob', 5), ('dave', None)]:
+            db.session.add(User(vly_user_id=vly_user_id))
+            db.session.add(Transaction(vly_user_id=vly_user_id, tx_count=tx_count))
+        db.session.commit()
+
+    def test_rebuild_ranks_by_count_then_user(self):
+        leaderboard.rebuild_leaderboard()
+        db.session.commit()
+
+        entries = LeaderboardEntry.query.order_by(LeaderboardEntry.rank).all()
+        self.assertEqual([(e.rank, e.vly_user_id, e.score) for e in entries],
+                         [(1, 'alice', 9), (2, 'bob', 5), (3, 'carol', 5), (4, 'dave', 0)])
+
+    def test_rebuild_replaces_previous_ranking(self):
+        leaderboard.rebuild_leaderboard()
+        Transaction.query.filter_by(vly_user_id='dave').update({'tx_count': 20})
+        leaderboard.rebuild_leaderboard()
+        db.session.commit()
+
+        self.assertEqual(LeaderboardEntry.query.count(), 4)
+        self.assertEqual(leaderboard.top_entries(2),
+                         [{'vly_user_id': 'dave', 'tx_count': 20}, {'vly_user_id': 'alice', 'tx_count': 9}])
+
+    def test_top_entries_before_first_rebuild(self):
+        self.assertEqual(leaderboard.top_entries(1), [{'vly_user_id': 'alice', 'tx_count': 9}])
+
+    def test_ranking_pages_follow_keyset_cursor(self):
+        for i in range(5):
+            db.session.add(User(vly_user_id=f'tie{i}'))
+            db.session.add(Transaction(vly_user_id=f'tie{i}', tx_count=5))
+        db.session.commit()
+
+        seen = []
+        cursor = {}
+        while True:
+            entries, cursor = leaderboard.ranking_page(limit=3, **(cursor or {}))
+            seen.extend((e['tx_count'], e['vly_user_id']) for e in entries)
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, [(9, 'alice'), (5, 'bob'), (5, 'carol')] + [(5, f'tie{i}') for i in range(5)] + [(0, 'dave')])
+
+    def test_sync_generation_bumps(self):
+        self.assertEqual(leaderboard.current_sync_generation(), 0)
+        leaderboard.bump_sync_generation()
+        leaderboard.bump_sync_generation()
+        db.session.commit()
+        self.assertEqual(leaderboard.current_sync_generation(), 2)
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_entries_expire_with_generation(self):
+        cache = ResponseCache()
+        cache.put(1, 'en', 'page-en')
+        cache.put(1, 'ja', 'page-ja')
+        self.assertEqual(cache.get(1, 'ja'), 'page-ja')
+
+        cache.put(2, 'en', 'page-en-2')
+        self.assertIsNone(cache.get(1, 'en'))
+        self.assertIsNone(cache.get(2, 'ja'))
+        self.assertEqual(cache.get(2, 'en'), 'page-en-2')
+
+        # A slow renderer finishing an old generation does not evict newer pages
+        cache.put(1, 'ja', 'stale')
+        self.assertEqual(cache.get(2, 'en'), 'page-en-2')
+
+
+class TestLeaderboardView(DatabaseTestCase):
+    def create_app(self):
+        app = make_app(template_folder='../templates', static_folder='../static')
+        app.secret_key = 'test'
+        app.config['WTF_CSRF_ENABLED'] = False
+        Babel(app)
+        login_manager = LoginManager(app)
+        login_manager.user_loader(lambda user_id: db.session.get(Admin, int(user_id)))
+        register_routes(app)
+        return app
+
+    def setUp(self):
+        super().setUp()
+        admin = Admin(username='admin')
+        admin.set_password('password123')
+        db.session.add_all([admin, User(vly_user_id='alice'), Transaction(vly_user_id='alice', tx_count=3)])
+        db.session.commit()
+        self.client = self.app.test_client()
+        self.client.post('/admin/login', data={'username': 'admin', 'password': 'password123'})
+        self.client.get('/leaderboard')  # consume the login flash
+
+    def test_etag_revalidation_until_next_sync(self):
+        first = self.client.get('/leaderboard')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn(b'alice', first.data)
+        etag = first.headers['ETag']
+
+        cached = self.client.get('/leaderboard', headers={'If-None-Match': etag})
+        self.assertEqual(cached.status_code, 304)
+
+        leaderboard.rebuild_leaderboard()
+        leaderboard.bump_sync_generation()
+        db.session.commit()
+        refreshed = self.client.get('/leaderboard', headers={'If-None-Match': etag})
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertNotEqual(refreshed.headers['ETag'], etag)
+
+    def test_api_leaderboard_pages(self):
+        db.session.add_all([User(vly_user_id='bob'), Transaction(vly_user_id='bob', tx_count=3)])
+        db.session.commit()
+
+        first = self.client.get('/api/leaderboard?limit=1').get_json()
+        self.assertEqual(first['entries'], [{'vly_user_id': 'alice', 'tx_count': 3}])
+        self.assertEqual(first['next'], {'after_count': 3, 'after_user': 'alice'})
+
+        second = self.client.get('/api/leaderboard', query_string=dict(first['next'], limit=1)).get_json()
+        self.assertEqual(second['entries'], [{'vly_user_id': 'bob', 'tx_count': 3}])
+        self.assertIsNone(second['next'])
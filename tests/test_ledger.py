@@ -0,0 +1,47 @@
+from datetime import datetime
+from ic.principal import Principal
+from models import db, LedgerEntry
+from vly_wallet_api import AccountSync
+import ledger
+from tests.helpers import DatabaseTestCase
+
+NS = 1_000_000_000
+
+
+def record(tx_id, seconds, amount=100):
+    return {
+        'Transaction ID': tx_id,
+        'Type': 'transfer',
+        'Sender': Principal.anonymous(),
+        'Receiver': Principal.management_canister(),
+        'Amount': amount,
+        'Timestamp': seconds * NS,
+    }
+
+
+class TestLedger(DatabaseTestCase):
+    def test_entries_are_deduplicated_per_account(self):
+        first = {'alice': AccountSync('acc-a', 2, 2, (record(2, 2000), record(1, 1000))), 'bob': None}
+        again = {'alice': AccountSync('acc-a', 1, 3, (record(3, 3000), record(2, 2000)))}
+        shared = {'carol': AccountSync('acc-c', 1, 2, (record(2, 2000),))}
+
+        for results in (first, again, shared):
+            ledger.write_ledger_entries(results)
+            db.session.commit()
+
+        entries = LedgerEntry.query.order_by(LedgerEntry.account, LedgerEntry.tx_id).all()
+        self.assertEqual([(e.account, e.tx_id) for e in entries],
+                         [('acc-a', 1), ('acc-a', 2), ('acc-a', 3), ('acc-c', 2)])
+        self.assertEqual(entries[0].sender, Principal.anonymous().to_str())
+        self.assertEqual(entries[0].timestamp, datetime(1970, 1, 1, 0, 16, 40))
+
+    def test_account_stats_time_window(self):
+        ledger.write_ledger_entries({'alice': AccountSync('acc-a', 3, 3, (
+            record(1, 1000, 10), record(2, 2000, 20), record(3, 3000, 30)))})
+        db.session.commit()
+
+        stats = ledger.account_stats(since=datetime.utcfromtimestamp(1500))
+
+        self.assertEqual(stats['acc-a'].tx_count, 2)
+        self.assertEqual(int(stats['acc-a'].amount), 50)
+        self.assertEqual(stats['acc-a'].last_activity, datetime.utcfromtimestamp(3000))
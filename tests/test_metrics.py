@@ -0,0 +1,99 @@
+import unittest
+import urllib.request
+from datetime import datetime
+from unittest import mock
+from models import db, User, SyncRun
+from vly_wallet_api import AccountSync
+from app import create_app
+import metrics
+import update_transactions
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+
+    def test_counter_and_gauge_text_format(self):
+        calls = metrics.Counter('calls_total', "Calls", ['upstream'], registry=self.registry)
+        last = metrics.Gauge('last_seconds', "Last", registry=self.registry)
+        calls.inc(upstream='vly-api')
+        calls.inc(2, upstream='vly-api')
+        calls.inc(upstream='ic "node"')
+        last.set(12.5)
+
+        self.assertEqual(self.registry.render(), "\n".join([
+            "# HELP calls_total Calls",
+            "# TYPE calls_total counter",
+            'calls_total{upstream="ic \\"node\\""} 1.0',
+            'calls_total{upstream="vly-api"} 3.0',
+            "# HELP last_seconds Last",
+            "# TYPE last_seconds gauge",
+            "last_seconds 12.5",
+        ]) + "\n")
+
+    def test_histogram_buckets_are_cumulative(self):
+        latency = metrics.Histogram('stage_seconds', "Stage", ['stage'], buckets=(0.1, 1), registry=self.registry)
+        for value in (0.05, 0.5, 0.7, 3):
+            latency.observe(value, stage='commit')
+
+        lines = self.registry.render().splitlines()
+
+        self.assertIn('stage_seconds_bucket{stage="commit",le="0.1"} 1.0', lines)
+        self.assertIn('stage_seconds_bucket{stage="commit",le="1.0"} 3.0', lines)
+        self.assertIn('stage_seconds_bucket{stage="commit",le="+Inf"} 4.0', lines)
+        self.assertIn('stage_seconds_sum{stage="commit"} 4.25', lines)
+        self.assertIn('stage_seconds_count{stage="commit"} 4.0', lines)
+
+    def test_metrics_server(self):
+        metrics.Counter('served_total', "Served", registry=self.registry).inc()
+        server = metrics.start_metrics_server(port=0, registry=self.registry)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+                self.assertIn("served_total 1.0", response.read().decode())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_server_is_off_without_port(self):
+        with mock.patch.object(metrics, 'METRICS_PORT', None):
+            self.assertIsNone(metrics.start_metrics_server())
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(User(vly_user_id='alice'))
+            db.session.commit()
+
+    def test_pipeline_stages_and_last_sync_are_exposed(self):
+        with self.app.app_context(), \
+                mock.patch.object(update_transactions, 'resolve_addresses', return_value=({'alice': 'acc-a'}, [])), \
+                mock.patch.object(update_transactions, 'sync_accounts',
+                                  return_value={'alice': AccountSync('acc-a', 2, 20)}):
+            update_transactions.update_transactions()
+            finished_at = db.session.scalar(db.select(SyncRun.finished_at))
+
+        response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        body = response.get_data(as_text=True)
+        for stage in ('address_lookup', 'canister_query', 'db_write', 'commit', 'rebuild'):
+            self.assertIn(f'vly_sync_stage_seconds_count{{stage="{stage}"}}', body)
+        self.assertIn('vly_sync_users_total{outcome="inserted"}', body)
+        self.assertIn('vly_sync_run_users_done 1.0', body)
+        expected = (finished_at - datetime(1970, 1, 1)).total_seconds()
+        self.assertIn(f'vly_sync_last_success_timestamp_seconds {expected!r}', body)
+
+    def test_token_is_required_when_configured(self):
+        with mock.patch('views.METRICS_TOKEN', 'secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+            self.assertEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+from datetime import datetime
+import numpy as np
+from models import db, User, Transaction, LedgerEntry
+import points
+from tests.helpers import DatabaseTestCase
+
+
+class TestPoints(DatabaseTestCase):
+    def test_batch_scores_match_calculate_points(self):
+        rng = np.random.default_rng(7)
+        size = 500
+        count = rng.integers(0, 1000, size)
+        amount = rng.uniform(0, 50_000, size).round(2)
+        frequency = rng.integers(0, 30, size)
+        streak = rng.integers(0, 20, size)
+
+        batch = points.score_points(count, amount, frequency, streak)
+
+        for i in range(size):
+            transaction = Transaction(count=int(count[i]), amount=float(amount[i]),
+                                      transaction_frequency=int(frequency[i]), weekly_streak=int(streak[i]))
+            self.assertEqual(transaction.calculate_points(), batch[i])
+
+    def test_update_points_writes_only_changed_scores(self):
+        db.session.add_all([User(vly_user_id='alice'), User(vly_user_id='bob')])
+        db.session.add_all([
+            Transaction(vly_user_id='alice', tx_count=5, amount=1500.0, transaction_frequency=3, weekly_streak=2),
+            Transaction(vly_user_id='bob', tx_count=1, points=10),
+        ])
+        db.session.commit()
+
+        self.assertEqual(points.update_points(), 1)
+        db.session.commit()
+
+        scores = {t.vly_user_id: t.points for t in Transaction.query.all()}
+        self.assertEqual(scores, {'alice': 180, 'bob': 10})
+
+    def test_inputs_refreshed_from_ledger_window(self):
+        db.session.add_all([User(vly_user_id='alice'), User(vly_user_id='bob'), User(vly_user_id='carol')])
+        db.session.add_all([
+            Transaction(vly_user_id='alice', tx_count=3, account='acc-a'),
+            Transaction(vly_user_id='bob', tx_count=0, account='acc-b', amount=5.0, transaction_frequency=1),
+            # Not synced in this run
+            Transaction(vly_user_id='carol', tx_count=1, account='acc-c', amount=7.0, transaction_frequency=1),
+        ])
+        db.session.add_all([
+            LedgerEntry(account='acc-a', tx_id=1, amount=10**8, timestamp=datetime(2024, 12, 1, 9)),
+            LedgerEntry(account='acc-a', tx_id=2, amount=2 * 10**8, timestamp=datetime(2024, 12, 1, 18)),
+            LedgerEntry(account='acc-a', tx_id=3, amount=5 * 10**7, timestamp=datetime(2024, 12, 3)),
+            # Before the window
+            LedgerEntry(account='acc-a', tx_id=0, amount=10**9, timestamp=datetime(2024, 10, 1)),
+        ])
+        db.session.commit()
+
+        self.assertEqual(points.refresh_points_inputs(['acc-a', 'acc-b'], datetime(2024, 11, 1)), 2)
+        db.session.commit()
+
+        rows = {t.vly_user_id: (t.amount, t.transaction_frequency) for t in Transaction.query.all()}
+        self.assertEqual(rows, {'alice': (3.5, 2), 'bob': (0.0, 0), 'carol': (7.0, 1)})
+        self.assertEqual(points.refresh_points_inputs(['acc-a', 'acc-b'], datetime(2024, 11, 1)), 0)
@@ -0,0 +1,56 @@
+import unittest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest import mock
+from models import db, SyncGeneration
+import scheduler
+from tests.helpers import make_app
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.app = make_app()
+
+    def test_lock_is_granted_without_postgresql(self):
+        with self.app.app_context():
+            with scheduler.advisory_lock(db.engine, scheduler.SYNC_LOCK_KEY) as lock_connection:
+                self.assertIsNotNone(lock_connection)
+                self.assertTrue(scheduler.holds_advisory_lock(lock_connection, scheduler.SYNC_LOCK_KEY))
+
+    def test_runs_sync_in_the_given_app_context(self):
+        with mock.patch('update_transactions.update_transactions') as update:
+            scheduler.run_update_transactions(self.app)
+        update.assert_called_once_with()
+
+    def test_skips_run_while_another_process_holds_the_lock(self):
+        @contextmanager
+        def held(engine, key):
+            yield None
+
+        with mock.patch.object(scheduler, 'advisory_lock', held), \
+                mock.patch('update_transactions.update_transactions') as update:
+            scheduler.run_update_transactions(self.app)
+        update.assert_not_called()
+
+    def test_leadership_ends_when_the_lock_session_dies(self):
+        lock_connection = mock.Mock()
+        with mock.patch.object(scheduler, 'holds_advisory_lock', side_effect=[True, ConnectionError("gone")]) as holds, \
+                mock.patch.object(scheduler.time, 'sleep'):
+            scheduler._hold_leadership(lock_connection)
+
+        self.assertEqual(holds.call_count, 2)
+        holds.assert_called_with(lock_connection, scheduler.LEADER_LOCK_KEY)
+
+    def test_first_run_waits_for_the_interval_after_the_last_sync(self):
+        now = datetime.now()
+        self.assertLess(scheduler._first_run_time(self.app), now + timedelta(minutes=1))
+
+        with self.app.app_context():
+            db.session.add(SyncGeneration(id=1, generation=1, updated_at=datetime.utcnow() - timedelta(hours=1)))
+            db.session.commit()
+        expected = now + scheduler.SYNC_INTERVAL - timedelta(hours=1)
+        self.assertAlmostEqual(scheduler._first_run_time(self.app).timestamp(), expected.timestamp(), delta=60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from datetime import datetime, date
+from models import db, User, Transaction, LedgerEntry
+import streaks
+from tests.helpers import DatabaseTestCase
+
+
+class TestStreaks(unittest.TestCase):
+    def test_week_index_changes_on_monday(self):
+        sunday = streaks.week_index(date(2024, 11, 3))
+        monday = streaks.week_index(date(2024, 11, 4))
+        self.assertEqual(monday, sunday + 1)
+        self.assertEqual(streaks.week_index(date(2024, 11, 10)), monday)
+        self.assertEqual(streaks.week_index(int(datetime(2024, 11, 4, 12).timestamp()) * 1_000_000_000), monday)
+
+    def test_advance_streak(self):
+        self.assertEqual(streaks.advance_streak(None, 0, []), (None, 0))
+        self.assertEqual(streaks.advance_streak(None, 0, [10, 11, 11, 12]), (12, 3))
+        # Already counted weeks are ignored, the next week extends the streak
+        self.assertEqual(streaks.advance_streak(12, 3, [12, 13]), (13, 4))
+        # A skipped week starts over
+        self.assertEqual(streaks.advance_streak(13, 4, [15, 16]), (16, 2))
+
+
+class TestStreakStorage(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([User(vly_user_id='alice'), User(vly_user_id='bob')])
+        db.session.add_all([
+            Transaction(vly_user_id='alice', account='acc-a', weekly_streak=9, last_active_week=1),
+            Transaction(vly_user_id='bob', account='acc-b', weekly_streak=2,
+                        last_active_week=streaks.week_index(date(2024, 11, 25))),
+        ])
+        for tx_id, day in enumerate([date(2024, 11, 4), date(2024, 11, 12), date(2024, 11, 14), date(2024, 11, 18)]):
+            db.session.add(LedgerEntry(account='acc-a', tx_id=tx_id, amount=0,
+                                       timestamp=datetime(day.year, day.month, day.day)))
+        db.session.commit()
+
+    def test_rebuild_from_ledger(self):
+        streaks.rebuild_weekly_streaks(today=date(2024, 11, 20))
+        db.session.commit()
+
+        alice = Transaction.query.filter_by(vly_user_id='alice').one()
+        self.assertEqual((alice.last_active_week, alice.weekly_streak), (streaks.week_index(date(2024, 11, 18)), 3))
+        bob = Transaction.query.filter_by(vly_user_id='bob').one()
+        self.assertEqual((bob.last_active_week, bob.weekly_streak), (None, 0))
+
+    def test_expire_streaks_after_a_missed_week(self):
+        streaks.expire_streaks(today=date(2024, 12, 2))
+        db.session.commit()
+
+        result = {t.vly_user_id: t.weekly_streak for t in Transaction.query.all()}
+        self.assertEqual(result, {'alice': 0, 'bob': 2})
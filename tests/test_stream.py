@@ -0,0 +1,135 @@
+import threading
+import unittest
+from models import db, User, Transaction
+from leaderboard import rebuild_leaderboard, bump_sync_generation
+from stream import EventBroadcaster, LeaderboardPublisher, leaderboard_delta, event_stream
+from tests.helpers import make_app
+
+
+class TestEventBroadcaster(unittest.TestCase):
+    def test_waiting_subscribers_all_receive_published_events(self):
+        broadcaster = EventBroadcaster()
+        broadcaster.publish(None, 1, [])
+        received = []
+
+        def subscriber():
+            received.append(broadcaster.wait(1, timeout=5))
+
+        threads = [threading.Thread(target=subscriber) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        broadcaster.publish(1, 2, [('transaction_update', {'user_id': 'alice'})])
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(received, [(2, [('transaction_update', {'user_id': 'alice'})])] * 20)
+
+    def test_replay_bridges_batches_without_events(self):
+        broadcaster = EventBroadcaster()
+        broadcaster.publish(None, 1, [])
+        broadcaster.publish(1, 2, [('a', {})])
+        broadcaster.publish(2, 3, [])
+        broadcaster.publish(3, 4, [('b', {})])
+
+        self.assertEqual(broadcaster.wait(1, timeout=0), (4, [('a', {}), ('b', {})]))
+        self.assertEqual(broadcaster.wait(3, timeout=0), (4, [('b', {})]))
+
+    def test_subscriber_behind_history_is_told_to_reload(self):
+        broadcaster = EventBroadcaster(history=2)
+        broadcaster.publish(None, 1, [])
+        broadcaster.publish(1, 2, [('a', {})])
+        broadcaster.publish(2, 3, [('b', {})])
+        broadcaster.publish(3, 4, [('c', {})])
+
+        self.assertIsNone(broadcaster.wait(1, timeout=0))
+        self.assertEqual(broadcaster.wait(2, timeout=0), (4, [('b', {}), ('c', {})]))
+
+    def test_generation_this_process_skipped_is_told_to_reload(self):
+        # Two syncs finished within one poll here, another worker published both
+        broadcaster = EventBroadcaster()
+        broadcaster.publish(None, 1, [])
+        broadcaster.publish(1, 3, [('a', {})])
+
+        self.assertIsNone(broadcaster.wait(2, timeout=0))
+
+    def test_subscriber_ahead_of_this_process_waits(self):
+        broadcaster = EventBroadcaster()
+        broadcaster.publish(None, 1, [])
+
+        self.assertEqual(broadcaster.wait(2, timeout=0), (2, []))
+
+    def test_event_stream_replays_from_last_event_id(self):
+        broadcaster = EventBroadcaster()
+        broadcaster.publish(None, 1, [])
+        broadcaster.publish(1, 2, [('transaction_update', {'user_id': 'alice', 'rank': 1, 'count': 3})])
+        stream = event_stream(broadcaster, last_event_id=1, heartbeat=0)
+
+        self.assertEqual(next(stream), "retry: 5000\nid: 1\n\n")
+        self.assertEqual(next(stream),
+                         'event: transaction_update\ndata: {"user_id": "alice", "rank": 1, "count": 3}\n\n')
+        self.assertEqual(next(stream), "id: 2\n\n")
+        self.assertEqual(next(stream), ": keep-alive\n\n")
+
+    def test_event_stream_starts_at_the_current_generation(self):
+        broadcaster = EventBroadcaster()
+        broadcaster.publish(None, 1, [])
+        broadcaster.publish(1, 2, [('a', {})])
+        stream = event_stream(broadcaster, heartbeat=0)
+
+        self.assertEqual(next(stream), "retry: 5000\nid: 2\n\n")
+        self.assertEqual(next(stream), ": keep-alive\n\n")
+
+
+class TestLeaderboardPublisher(unittest.TestCase):
+    def setUp(self):
+        self.app = make_app()
+        with self.app.app_context():
+            for vly_user_id, tx_count in [('alice', 9), ('bob', 5), ('carol', 1)]:
+                db.session.add(User(vly_user_id=vly_user_id))
+                db.session.add(Transaction(vly_user_id=vly_user_id, tx_count=tx_count))
+            rebuild_leaderboard()
+            bump_sync_generation()
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_only_changed_entries_are_published(self):
+        broadcaster = EventBroadcaster()
+        publisher = LeaderboardPublisher(self.app, broadcaster, top_n=2)
+        publisher.poll()
+        publisher.poll()
+        generation = broadcaster.generation
+        self.assertEqual(broadcaster.wait(generation, timeout=0), (generation, []))
+
+        with self.app.app_context():
+            Transaction.query.filter_by(vly_user_id='carol').update({'tx_count': 7})
+            rebuild_leaderboard()
+            bump_sync_generation()
+            db.session.commit()
+        publisher.poll()
+
+        self.assertEqual(broadcaster.wait(generation, timeout=0), (generation + 1, [
+            ('leaderboard_remove', {'user_id': 'bob'}),
+            ('transaction_update', {'user_id': 'carol', 'rank': 2, 'count': 7}),
+        ]))
+
+    def test_newcomer_replaces_the_last_entry_of_a_full_top_n(self):
+        previous = {'alice': (1, 9), 'bob': (2, 5)}
+        current = {'alice': (1, 9), 'carol': (2, 7)}
+        table = dict(previous)
+
+        # Apply the events like static/js/leaderboard.js, which only adds rows while the table has room
+        for event, data in leaderboard_delta(previous, current):
+            if event == 'leaderboard_remove':
+                table.pop(data['user_id'], None)
+            elif data['user_id'] in table or len(table) < 2:
+                table[data['user_id']] = (data['rank'], data['count'])
+
+        self.assertEqual(table, current)
+
+    def test_delta_of_identical_snapshots_is_empty(self):
+        snapshot = {'alice': (1, 9)}
+        self.assertEqual(leaderboard_delta(snapshot, dict(snapshot)), [])
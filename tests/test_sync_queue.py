@@ -0,0 +1,97 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from models import db, User, Transaction, SyncJob
+from vly_wallet_api import AccountSync
+from leaderboard import current_sync_generation
+from sync_runs import sync_progress
+import sync_queue
+import update_transactions
+from tests.helpers import DatabaseTestCase
+
+
+class TestSyncQueue(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([User(vly_user_id=f'u{i}') for i in range(1, 6)])
+        db.session.commit()
+        self.failing = set()
+        self.synced = []
+        patches = [
+            mock.patch.object(update_transactions, 'resolve_addresses',
+                              side_effect=lambda ids, now: ({u: f'acc-{u}' for u in ids}, [])),
+            mock.patch.object(update_transactions, 'sync_accounts', side_effect=self.fake_sync),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def fake_sync(self, vly_user_ids, **kwargs):
+        self.synced.append(list(vly_user_ids))
+        if self.failing & set(vly_user_ids):
+            raise ConnectionError("boom")
+        return {u: AccountSync(f'acc-{u}', 1, 10) for u in vly_user_ids}
+
+    def statuses(self):
+        return {job.vly_user_id: job.status for job in SyncJob.query.all()}
+
+    def test_workers_drain_queue_and_last_batch_finishes_run(self):
+        sync_queue.enqueue_sync_run()
+        sync_queue.enqueue_sync_run()
+        self.assertEqual(SyncJob.query.count(), 5)
+
+        sync_queue.run_worker('w1', batch_size=2, once=True)
+
+        self.assertEqual(self.synced, [['u1', 'u2'], ['u3', 'u4'], ['u5']])
+        self.assertEqual(set(self.statuses().values()), {'done'})
+        self.assertEqual(Transaction.query.count(), 5)
+        self.assertEqual(sync_progress()['status'], 'finished')
+        self.assertEqual(sync_progress()['users_done'], 5)
+        self.assertEqual(current_sync_generation(), 1)
+
+    def test_claims_do_not_overlap(self):
+        sync_queue.enqueue_sync_run()
+
+        first = [job.vly_user_id for job in sync_queue.claim_jobs('w1', 2)]
+        second = [job.vly_user_id for job in sync_queue.claim_jobs('w2', 2)]
+
+        self.assertEqual((first, second), (['u1', 'u2'], ['u3', 'u4']))
+
+    def test_failed_batch_is_retried_then_given_up(self):
+        sync_queue.enqueue_sync_run()
+        self.failing = {'u1'}
+
+        with mock.patch.object(sync_queue, 'SYNC_JOB_MAX_ATTEMPTS', 2):
+            jobs = sync_queue.claim_jobs('w1', 1)
+            self.assertFalse(sync_queue.process_jobs(jobs))
+            self.assertEqual(self.statuses()['u1'], 'pending')
+            sync_queue.run_worker('w1', batch_size=1, once=True)
+
+        self.assertEqual(self.statuses()['u1'], 'failed')
+        self.assertEqual(sync_progress()['status'], 'finished')
+        self.assertEqual(sync_progress()['users_done'], 4)
+
+    def test_expired_lease_is_claimed_again(self):
+        sync_queue.enqueue_sync_run()
+        sync_queue.claim_jobs('dead', 5)
+
+        self.assertEqual(sync_queue.claim_jobs('w1', 5), [])
+        later = datetime.utcnow() + sync_queue.SYNC_JOB_LEASE + timedelta(seconds=1)
+        jobs = sync_queue.claim_jobs('w1', 5, now=later)
+
+        self.assertEqual(len(jobs), 5)
+        self.assertEqual({(job.claimed_by, job.attempts) for job in jobs}, {('w1', 2)})
+
+    def test_serial_run_is_continued_by_the_queue(self):
+        run = sync_queue.start_sync_run()
+        run.last_vly_user_id = 'u2'
+        run.users_done = 2
+        db.session.commit()
+
+        sync_queue.enqueue_sync_run()
+
+        self.assertEqual(sorted(self.statuses()), ['u3', 'u4', 'u5'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import time
+from datetime import datetime
+from unittest import mock
+from models import db, User, Transaction, SyncRun
+from vly_wallet_api import AccountSync
+from leaderboard import current_sync_generation
+from metrics import SYNC_USERS
+import sync_runs
+import update_transactions
+import vly_wallet_api
+from tests.helpers import DatabaseTestCase
+
+
+class TestUpdateTransactions(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.earlier = datetime(2024, 11, 20)
+        for vly_user_id in ['unchanged', 'active', 'moved', 'new', 'no_wallet']:
+            db.session.add(User(vly_user_id=vly_user_id))
+        db.session.add_all([
+            Transaction(vly_user_id='unchanged', tx_count=5, account='acc-u', last_tx_id=50, last_updated=self.earlier),
+            Transaction(vly_user_id='active', tx_count=5, account='acc-a', last_tx_id=50, last_updated=self.earlier),
+            Transaction(vly_user_id='moved', tx_count=9, account='acc-old', last_tx_id=90, last_updated=self.earlier),
+        ])
+        db.session.commit()
+
+    def run_sync(self, addresses, results, lookup_failed=()):
+        sync = mock.Mock(return_value=results)
+        with mock.patch.object(update_transactions, 'resolve_addresses',
+                               return_value=(addresses, list(lookup_failed))), \
+                mock.patch.object(update_transactions, 'sync_accounts', sync):
+            update_transactions.update_transactions()
+        return sync
+
+    def test_incremental_counts_and_only_changed_rows_written(self):
+        addresses = {'unchanged': 'acc-u', 'active': 'acc-a', 'moved': 'acc-new', 'new': 'acc-n', 'no_wallet': None}
+        results = {
+            'unchanged': AccountSync('acc-u', 0, 50),
+            'active': AccountSync('acc-a', 3, 53),
+            'moved': AccountSync('acc-new', 4, 120),
+            'new': AccountSync('acc-n', 7, 70, ({
+                'Transaction ID': 70, 'Type': 'transfer', 'Sender': None, 'Receiver': None,
+                'Amount': 1, 'Timestamp': int(time.time()) * 10**9,
+            },)),
+            'no_wallet': None,
+        }
+        Transaction.query.filter_by(vly_user_id='unchanged').update({'amount': 2.5})
+        db.session.commit()
+
+        sync = self.run_sync(addresses, results)
+
+        self.assertEqual(sync.call_args.kwargs['since_tx_ids'], {'unchanged': 50, 'active': 50})
+        rows = {t.vly_user_id: t for t in Transaction.query.all()}
+        self.assertEqual(set(rows), {'unchanged', 'active', 'moved', 'new'})
+        self.assertEqual(rows['unchanged'].last_updated, self.earlier)
+        self.assertEqual((rows['active'].tx_count, rows['active'].last_tx_id), (8, 53))
+        self.assertEqual((rows['moved'].tx_count, rows['moved'].account), (4, 'acc-new'))
+        self.assertEqual((rows['new'].tx_count, rows['new'].last_tx_id), (7, 70))
+        self.assertEqual(rows['new'].weekly_streak, 1)
+        # Points inputs are refreshed for accounts with new ledger entries only
+        self.assertEqual((rows['new'].amount, rows['new'].transaction_frequency), (1 / 10 ** 8, 1))
+        self.assertEqual(rows['unchanged'].amount, 2.5)
+        self.assertGreater(rows['active'].last_updated, self.earlier)
+
+    def test_users_without_wallet_are_not_counted_as_failed(self):
+        addresses = {'unchanged': 'acc-u', 'active': 'acc-a', 'moved': 'acc-new', 'new': 'acc-n', 'no_wallet': None}
+        results = dict.fromkeys(addresses, None)
+        results['unchanged'] = AccountSync('acc-u', 0, 50)
+        before = {outcome: SYNC_USERS.value(outcome=outcome) for outcome in ('no_wallet', 'failed')}
+
+        with self.assertLogs(update_transactions.logger, 'DEBUG') as logs:
+            self.run_sync(addresses, results)
+
+        self.assertEqual(SYNC_USERS.value(outcome='no_wallet') - before['no_wallet'], 1)
+        self.assertEqual(SYNC_USERS.value(outcome='failed') - before['failed'], 3)
+        no_wallet, = [line for line in logs.output if 'no_wallet' in line]
+        self.assertTrue(no_wallet.startswith('DEBUG'))
+
+    def test_failed_address_lookups_are_counted_as_failed(self):
+        addresses = {'unchanged': 'acc-u', 'active': 'acc-a', 'moved': 'acc-new', 'new': None, 'no_wallet': None}
+        results = dict.fromkeys(addresses, None)
+        results.update(unchanged=AccountSync('acc-u', 0, 50), active=AccountSync('acc-a', 0, 50),
+                       moved=AccountSync('acc-new', 0, 90))
+        before = {outcome: SYNC_USERS.value(outcome=outcome) for outcome in ('no_wallet', 'failed')}
+
+        self.run_sync(addresses, results, lookup_failed=['new'])
+
+        self.assertEqual(SYNC_USERS.value(outcome='no_wallet') - before['no_wallet'], 1)
+        self.assertEqual(SYNC_USERS.value(outcome='failed') - before['failed'], 1)
+
+
+class TestResumableSync(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user_ids = ['u1', 'u2', 'u3', 'u4', 'u5']
+        db.session.add_all([User(vly_user_id=vly_user_id) for vly_user_id in self.user_ids])
+        db.session.commit()
+
+    def run_sync(self, fail_on=None):
+        batches = []
+
+        def fake_sync(vly_user_ids, **kwargs):
+            batches.append(list(vly_user_ids))
+            if fail_on in vly_user_ids:
+                raise ConnectionError("boom")
+            return {u: AccountSync(f'acc-{u}', 1, 10) for u in vly_user_ids}
+
+        with mock.patch.object(update_transactions, 'resolve_addresses',
+                               side_effect=lambda ids, now: ({u: f'acc-{u}' for u in ids}, [])), \
+                mock.patch.object(update_transactions, 'sync_accounts', side_effect=fake_sync), \
+                mock.patch.object(sync_runs, 'SYNC_BATCH_SIZE', 2):
+            update_transactions.update_transactions()
+        return batches
+
+    def test_interrupted_run_resumes_after_last_committed_batch(self):
+        batches = self.run_sync(fail_on='u3')
+
+        self.assertEqual(batches, [['u1', 'u2'], ['u3', 'u4']])
+        self.assertEqual(Transaction.query.count(), 2)
+        progress = sync_runs.sync_progress()
+        self.assertEqual((progress['status'], progress['users_done'], progress['total_users']), ('running', 2, 5))
+        self.assertEqual(current_sync_generation(), 0)
+
+        batches = self.run_sync()
+
+        self.assertEqual(batches, [['u3', 'u4'], ['u5']])
+        self.assertEqual(Transaction.query.count(), 5)
+        self.assertEqual(SyncRun.query.count(), 1)
+        progress = sync_runs.sync_progress()
+        self.assertEqual((progress['status'], progress['users_done']), ('finished', 5))
+        self.assertEqual(current_sync_generation(), 1)
+
+    def test_failing_account_is_skipped_and_the_run_finishes(self):
+        def sync_account(agent, like_index, address, *args):
+            if address == 'acc-u3':
+                raise ValueError("undecodable reply")
+            return AccountSync(address, 1, 10)
+
+        with mock.patch.object(update_transactions, 'resolve_addresses',
+                               side_effect=lambda ids, now: ({u: f'acc-{u}' for u in ids}, [])), \
+                mock.patch.object(vly_wallet_api, 'sync_account', side_effect=sync_account), \
+                mock.patch.object(vly_wallet_api, '_new_agent'), \
+                mock.patch.object(sync_runs, 'SYNC_BATCH_SIZE', 2):
+            update_transactions.update_transactions()
+
+        self.assertEqual({t.vly_user_id for t in Transaction.query.all()}, {'u1', 'u2', 'u4', 'u5'})
+        self.assertEqual(sync_runs.sync_progress()['status'], 'finished')
+        self.assertEqual(current_sync_generation(), 1)
+
+    def test_finished_run_starts_a_new_one(self):
+        self.run_sync()
+        self.run_sync()
+
+        self.assertEqual(SyncRun.query.count(), 2)
+        self.assertEqual(sync_runs.sync_progress()['id'], 2)
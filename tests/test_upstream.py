@@ -0,0 +1,155 @@
+import unittest
+from unittest import mock
+
+import requests
+
+import upstream
+import vly_wallet_api
+from upstream import TokenBucket, CircuitBreaker, UpstreamPolicy, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def http_error(status, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = retry_after
+    return requests.exceptions.HTTPError(f"{status}", response=response)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_limits_rate_after_burst(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=2, clock=clock, sleep=clock.sleep)
+
+        for _ in range(6):
+            bucket.acquire()
+
+        self.assertAlmostEqual(clock.now, 2.0)
+
+    def test_pause_blocks_until_deadline(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=100, burst=1, clock=clock, sleep=clock.sleep)
+        bucket.pause(5)
+
+        bucket.acquire()
+
+        self.assertGreaterEqual(clock.now, 5)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_then_lets_one_probe_through(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        clock.now = 10
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+
+        clock.now = 20
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+
+class TestUpstreamPolicy(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def policy(self, **kwargs):
+        options = dict(rate=100, retry_on=(requests.exceptions.ConnectionError,), max_attempts=3,
+                       clock=self.clock, sleep=self.clock.sleep)
+        options.update(kwargs)
+        return UpstreamPolicy('test', **options)
+
+    def test_retries_and_honours_retry_after(self):
+        func = mock.Mock(side_effect=[http_error(429, '7'), requests.exceptions.ConnectionError(), 'ok'])
+        policy = self.policy()
+
+        self.assertEqual(policy.call(func, 'a', b=1), 'ok')
+
+        func.assert_called_with('a', b=1)
+        self.assertEqual(func.call_count, 3)
+        self.assertIn(7.0, self.clock.sleeps)
+
+    def test_client_errors_are_not_retried(self):
+        func = mock.Mock(side_effect=http_error(404))
+        policy = self.policy()
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            policy.call(func)
+
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual(policy.bucket.rate, 100)
+
+    def test_gives_up_after_max_attempts(self):
+        func = mock.Mock(side_effect=http_error(503))
+
+        with self.assertRaises(requests.exceptions.HTTPError):
+            self.policy().call(func)
+
+        self.assertEqual(func.call_count, 3)
+
+    def test_open_circuit_stops_calls(self):
+        func = mock.Mock(side_effect=http_error(503))
+        policy = self.policy(max_attempts=1, failure_threshold=2)
+        for _ in range(2):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                policy.call(func)
+
+        with self.assertRaises(CircuitOpenError):
+            policy.call(func)
+        self.assertEqual(func.call_count, 2)
+
+    def test_rate_backs_off_and_recovers(self):
+        policy = self.policy(max_attempts=1, failure_threshold=100)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            policy.call(mock.Mock(side_effect=http_error(429)))
+        self.assertEqual(policy.bucket.rate, 50)
+
+        for _ in range(10):
+            policy.call(lambda: None)
+        self.assertEqual(policy.bucket.rate, 100)
+
+    def test_retry_after_http_date(self):
+        error = http_error(503, 'Wed, 21 Oct 2015 07:28:30 GMT')
+        self.assertEqual(upstream.retry_after_seconds(error, now=1445412500), 10)
+
+
+class TestVlyApiPolicy(unittest.TestCase):
+    def test_lookup_retries_throttled_requests(self):
+        throttled = requests.Response()
+        throttled.status_code = 429
+        throttled.headers['Retry-After'] = '0'
+        found = requests.Response()
+        found.status_code = 200
+        found._content = b'{"data": {"address": "addr-alice"}}'
+        policy = UpstreamPolicy('vly-api', 100, sleep=lambda seconds: None)
+
+        with mock.patch.object(vly_wallet_api, 'VLY_API_POLICY', policy), \
+                mock.patch.object(vly_wallet_api.vly_http_session(), 'get', side_effect=[throttled, found]) as get:
+            self.assertEqual(vly_wallet_api.lookup_vly_wallet_address('alice'), 'addr-alice')
+
+        self.assertEqual(get.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,278 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import cbor2
+from ic.candid import decode
+from ic.identity import Identity
+from ic.principal import Principal
+
+import vly_wallet_api
+from tests.helpers import make_response, encode_response, FakeIndexAgent
+
+NS = 1_000_000_000
+ACCOUNT = Principal.anonymous().to_str()
+
+
+class TestGetVlyWalletAddresses(unittest.TestCase):
+    def test_preserves_order_and_results(self):
+        def fake_lookup(user_id):
+            time.sleep(0.01)
+            return None if user_id == "missing" else f"addr-{user_id}"
+
+        user_ids = ["alice", "missing", "bob", "carol"]
+        with mock.patch.object(vly_wallet_api, "lookup_vly_wallet_address", side_effect=fake_lookup):
+            addresses = vly_wallet_api.get_vly_wallet_addresses(user_ids, max_workers=4)
+
+        self.assertEqual(list(addresses), user_ids)
+        self.assertEqual(addresses["alice"], "addr-alice")
+        self.assertIsNone(addresses["missing"])
+
+    def test_concurrency_is_capped(self):
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        def fake_lookup(user_id):
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.02)
+            with lock:
+                state["active"] -= 1
+            return user_id
+
+        user_ids = [f"user{i}" for i in range(12)]
+        with mock.patch.object(vly_wallet_api, "lookup_vly_wallet_address", side_effect=fake_lookup):
+            vly_wallet_api.get_vly_wallet_addresses(user_ids, max_workers=3)
+
+        self.assertLessEqual(state["peak"], 3)
+        self.assertGreater(state["peak"], 1)
+
+    def test_failed_lookups_are_reported_separately(self):
+        def fake_lookup(user_id):
+            if user_id == "flaky":
+                raise vly_wallet_api.requests.exceptions.ConnectionError("boom")
+            return None if user_id == "missing" else f"addr-{user_id}"
+
+        with mock.patch.object(vly_wallet_api, "lookup_vly_wallet_address", side_effect=fake_lookup):
+            addresses, failed = vly_wallet_api.fetch_vly_wallet_addresses(["alice", "missing", "flaky"])
+
+        self.assertEqual(addresses, {"alice": "addr-alice", "missing": None})
+        self.assertEqual(failed, ["flaky"])
+
+    def test_empty_input(self):
+        self.assertEqual(vly_wallet_api.get_vly_wallet_addresses([]), {})
+
+
+class TestQueryTransactions(unittest.TestCase):
+    cutoff = 1_730_419_200  # 2024-11-01 UTC
+
+    def test_pages_with_start_cursor_and_stops_at_cutoff(self):
+        # ids 1..50 are before the cutoff, ids 51..300 after it
+        records = [(i, (self.cutoff + i if i > 50 else self.cutoff - 1000) * NS) for i in range(1, 301)]
+        agent = FakeIndexAgent(records)
+
+        count = vly_wallet_api.query_transactions(agent, "index", ACCOUNT, 100, self.cutoff)
+
+        self.assertEqual(count, 250)
+        self.assertEqual(agent.calls, [(100, []), (100, [201]), (100, [101])])
+
+    def test_short_history_is_a_single_call(self):
+        agent = FakeIndexAgent([(i, (self.cutoff + i) * NS) for i in range(1, 11)])
+
+        count = vly_wallet_api.query_transactions(agent, "index", ACCOUNT, 100, self.cutoff)
+
+        self.assertEqual(count, 10)
+        self.assertEqual(len(agent.calls), 1)
+
+    def test_cutoff_is_compared_in_nanoseconds(self):
+        agent = FakeIndexAgent([(1, (self.cutoff - 1) * NS), (2, (self.cutoff + 1) * NS)])
+
+        self.assertEqual(vly_wallet_api.query_transactions(agent, "index", ACCOUNT, 100, self.cutoff), 1)
+
+    def test_incremental_sync_stops_at_high_water_mark(self):
+        agent = FakeIndexAgent([(i, (self.cutoff + i) * NS) for i in range(1, 251)])
+
+        result = vly_wallet_api.sync_account(agent, "index", ACCOUNT, 100, self.cutoff, since_tx_id=230)
+
+        self.assertEqual(result, vly_wallet_api.AccountSync(ACCOUNT, 20, 250))
+        self.assertEqual(len(agent.calls), 1)
+
+    def test_collect_records_returns_only_new_records(self):
+        agent = FakeIndexAgent([(i, (self.cutoff + i) * NS) for i in range(1, 11)])
+
+        result = vly_wallet_api.sync_account(agent, "index", ACCOUNT, 100, self.cutoff, since_tx_id=7,
+                                             collect_records=True)
+
+        self.assertEqual([r['Transaction ID'] for r in result.records], [10, 9, 8])
+        self.assertEqual(result.records[0]['Amount'], 100)
+
+    def test_counting_does_not_decode_full_records(self):
+        agent = FakeIndexAgent([(i, (self.cutoff + i) * NS) for i in range(1, 11)])
+
+        with mock.patch.object(agent, 'query_raw') as query_raw, \
+                mock.patch.object(vly_wallet_api, 'decode') as full_decode:
+            count = vly_wallet_api.query_transactions(agent, "index", ACCOUNT, 100, self.cutoff)
+
+        self.assertEqual(count, 10)
+        query_raw.assert_not_called()
+        full_decode.assert_not_called()
+
+    def test_unexpected_reply_type_falls_back_to_full_decoding(self):
+        agent = FakeIndexAgent([(i, (self.cutoff + i) * NS) for i in range(1, 11)])
+
+        with mock.patch.object(vly_wallet_api, 'transaction_ids',
+                               side_effect=vly_wallet_api.CandidScanError("unexpected")):
+            count = vly_wallet_api.query_transactions(agent, "index", ACCOUNT, 100, self.cutoff)
+
+        self.assertEqual(count, 10)
+
+    def test_incremental_sync_without_new_activity_keeps_mark(self):
+        agent = FakeIndexAgent([])
+
+        result = vly_wallet_api.sync_account(agent, "index", ACCOUNT, 100, self.cutoff, since_tx_id=42)
+
+        self.assertEqual(result.new_count, 0)
+        self.assertEqual(result.newest_tx_id, 42)
+
+
+class TestSyncAccounts(unittest.TestCase):
+    cutoff = TestQueryTransactions.cutoff
+
+    def test_parallel_sync_uses_one_agent_per_worker_and_keeps_order(self):
+        owners = {}
+        lock = threading.Lock()
+
+        class OwnedAgent(FakeIndexAgent):
+            def query_reply(agent, *args):
+                with lock:
+                    owners.setdefault(id(agent), set()).add(threading.get_ident())
+                time.sleep(0.005)
+                return FakeIndexAgent.query_reply(agent, *args)
+
+        def new_agent():
+            return OwnedAgent([(i, (self.cutoff + i) * NS) for i in range(1, 6)])
+
+        addresses = {f"user{i}": (ACCOUNT if i % 3 else None) for i in range(12)}
+        with mock.patch.object(vly_wallet_api, "_new_agent", side_effect=new_agent), \
+                mock.patch.object(vly_wallet_api, "CUTOFF_DATE", self.cutoff):
+            results = vly_wallet_api.sync_accounts(list(addresses), addresses=addresses, max_workers=3)
+
+        self.assertEqual(list(results), list(addresses))
+        for user_id, address in addresses.items():
+            if address:
+                self.assertEqual(results[user_id].new_count, 5)
+            else:
+                self.assertIsNone(results[user_id])
+        self.assertLessEqual(len(owners), 3)
+        self.assertTrue(all(len(threads) == 1 for threads in owners.values()))
+
+    def test_failing_account_does_not_stop_the_others(self):
+        def sync_account(agent, like_index, address, *args):
+            if address == 'bad':
+                raise vly_wallet_api.CircuitOpenError("ic-boundary-node: circuit open")
+            return vly_wallet_api.AccountSync(address, 1, 1)
+
+        addresses = {'alice': 'good', 'bob': 'bad', 'carol': None}
+        with mock.patch.object(vly_wallet_api, 'sync_account', side_effect=sync_account), \
+                mock.patch.object(vly_wallet_api, '_new_agent'):
+            results = vly_wallet_api.sync_accounts(list(addresses), addresses=addresses, max_workers=2)
+
+        self.assertEqual(results, {'alice': vly_wallet_api.AccountSync('good', 1, 1), 'bob': None, 'carol': None})
+
+
+class TestRawReplyAgent(unittest.TestCase):
+    class FakeClient:
+        def __init__(self, result):
+            self.result = result
+
+        def query(self, canister_id, data):
+            return cbor2.dumps(self.result)
+
+    def agent(self, result):
+        return vly_wallet_api.RawReplyAgent(Identity(), self.FakeClient(result))
+
+    def test_reply_bytes_are_returned_undecoded(self):
+        reply = encode_response([(1, 10)])
+        agent = self.agent({'status': 'replied', 'reply': {'arg': reply}})
+
+        with mock.patch('ic.agent.decode', wraps=decode) as full_decode:
+            self.assertEqual(agent.query_reply(ACCOUNT, 'get_account_transactions', b'arg'), reply)
+        full_decode.assert_called_once_with(vly_wallet_api.EMPTY_CANDID_REPLY, None)
+
+    def test_query_raw_still_decodes(self):
+        agent = self.agent({'status': 'replied', 'reply': {'arg': encode_response([(1, 10)])}})
+
+        self.assertEqual(len(agent.query_raw(ACCOUNT, 'get_account_transactions', b'arg')), 1)
+
+    def test_rejected_query_raises(self):
+        agent = self.agent({'status': 'rejected', 'reject_code': 4, 'reject_message': 'no such method'})
+
+        with self.assertRaisesRegex(ValueError, 'no such method'):
+            agent.query_reply(ACCOUNT, 'get_account_transactions', b'arg')
+
+
+class TestIterTransactions(unittest.TestCase):
+    def test_full_records_match_process_transactions(self):
+        data = make_response([(7, 123 * NS)])
+
+        record, = vly_wallet_api.process_transactions(data)
+        record['Sender'] = record['Sender'].to_str()
+        record['Receiver'] = record['Receiver'].to_str()
+
+        self.assertEqual(record, {
+            'Transaction ID': 7,
+            'Type': 'transfer',
+            'Sender': Principal.anonymous().to_str(),
+            'Receiver': Principal.management_canister().to_str(),
+            'Amount': 100,
+            'Timestamp': 123 * NS,
+        })
+
+    def test_projection_only_returns_requested_fields(self):
+        data = make_response([(2, 20), (1, 10)])
+
+        records = list(vly_wallet_api.iter_transactions(data, ('Transaction ID', 'Timestamp')))
+
+        self.assertEqual(records, [{'Transaction ID': 2, 'Timestamp': 20}, {'Transaction ID': 1, 'Timestamp': 10}])
+
+    def test_missing_transfer_uses_defaults(self):
+        data = [{'type': 'rec', 'value': {'_17724': {'_3331539157': [
+            {'_23515': 3, '_1266835934': {'_1191829844': 'mint', '_2781795542': 30, '_3664621355': []}},
+        ]}}}]
+
+        record, = vly_wallet_api.process_transactions(data)
+
+        self.assertEqual(record['Type'], 'mint')
+        self.assertEqual(record['Amount'], 0)
+        self.assertIsNone(record['Sender'])
+        self.assertIsNone(record['Receiver'])
+
+
+class TestHttpPools(unittest.TestCase):
+    def tearDown(self):
+        vly_wallet_api.close_http_pools()
+
+    def test_sessions_are_shared_and_pooled(self):
+        session = vly_wallet_api.vly_http_session()
+        client = vly_wallet_api.ic_http_client()
+
+        self.assertIs(vly_wallet_api.vly_http_session(), session)
+        self.assertIs(vly_wallet_api.ic_http_client(), client)
+        self.assertEqual(session.get_adapter('https://service.vly.money')._pool_maxsize,
+                         vly_wallet_api.VLY_API_POOL_SIZE)
+
+        vly_wallet_api.close_http_pools()
+        self.assertIsNot(vly_wallet_api.vly_http_session(), session)
+
+    def test_agents_query_through_the_shared_client(self):
+        response = vly_wallet_api.httpx.Response(
+            200, content=b'cbor', request=vly_wallet_api.httpx.Request('POST', 'https://icp-api.io'))
+        client = vly_wallet_api.PolicyClient(url=vly_wallet_api.IC_BOUNDARY_NODE_URL)
+
+        with mock.patch.object(vly_wallet_api.ic_http_client(), 'post', return_value=response) as post:
+            self.assertEqual(client.query('index', b'request'), b'cbor')
+
+        post.assert_called_once_with('https://icp-api.io/api/v2/canister/index/query', content=b'request',
+                                     headers={'Content-Type': 'application/cbor'})
@@ -1,82 +1,218 @@
-from models import db, User, Transaction
+from models import db, Transaction
 from datetime import datetime
+import time
 import logging
-from app import create_app
-from models import User
-from vly_wallet_api import main as get_vly_transactions
+from sqlalchemy import select, insert, update
+from vly_wallet_api import sync_accounts, CUTOFF_DATE
+from address_cache import resolve_addresses
+from ledger import write_ledger_entries
+from leaderboard import rebuild_leaderboard, bump_sync_generation
+from points import refresh_points_inputs, update_points
+from streaks import week_index, advance_streak, expire_streaks
+from sync_runs import start_sync_run, next_user_batch, checkpoint_sync_run, finish_sync_run
+from metrics import SYNC_STAGE_SECONDS, SYNC_USERS, SYNC_LAST_SUCCESS
 
 logger = logging.getLogger(__name__)
 
+# Rows per executemany() round trip when writing transaction updates
+WRITE_BATCH_SIZE = 1000
 
-def update_transactions():
+
+def load_transaction_state(vly_user_ids=None):
+    """
+    Prefetch the stored Transaction row of every user in a single query,
+    keyed by vly_user_id. Only the columns the sync needs are loaded.
+    """
+    query = select(
+        Transaction.id,
+        Transaction.vly_user_id,
+        Transaction.tx_count,
+        Transaction.account,
+        Transaction.last_tx_id,
+        Transaction.last_active_week,
+        Transaction.weekly_streak,
+    ).order_by(Transaction.id)
+    if vly_user_ids is not None:
+        query = query.where(Transaction.vly_user_id.in_(vly_user_ids))
+
+    existing = {}
+    for row in db.session.execute(query):
+        # Keep the oldest row if a user somehow has several
+        existing.setdefault(row.vly_user_id, row)
+    return existing
+
+
+def plan_transaction_writes(vly_user_ids, sync_results, existing, since_tx_ids, current_time, addresses,
+                            lookup_failed=()):
     """
-    Update transaction data for all users based on the results from vly_api_like_tx.py
+    Work out which Transaction rows to insert and which to update.
+    Rows whose count and high-water mark did not change are left alone.
+    Users without an ICP address are skipped; users whose address lookup or
+    account sync failed are counted as failed.
     """
-    
-    users = User.query.all()
-    current_time = datetime.utcnow()
+    inserts = []
+    updates = []
+    for vly_user_id in vly_user_ids:
+        if vly_user_id not in sync_results:
+            logger.warning(
+                f"No transaction data for vly_user_id: {vly_user_id}")
+            SYNC_USERS.inc(outcome='no_data')
+            continue
+
+        result = sync_results[vly_user_id]
+        if result is None and vly_user_id in lookup_failed:
+            logger.warning(f"Failed to look up wallet address for vly_user_id: {vly_user_id}")
+            SYNC_USERS.inc(outcome='failed')
+            continue
+        if result is None and not addresses.get(vly_user_id):
+            logger.debug(f"No wallet address for vly_user_id: {vly_user_id}")
+            SYNC_USERS.inc(outcome='no_wallet')
+            continue
+        if result is None:
+            logger.warning(
+                f"Failed to get transaction count for vly_user_id: {vly_user_id}"
+            )
+            SYNC_USERS.inc(outcome='failed')
+            continue
+
+        row = existing.get(vly_user_id)
+        # Add new transactions to the stored count and streak, or start over if the account changed
+        if since_tx_ids.get(vly_user_id) is not None:
+            tx_count = (row.tx_count or 0) + result.new_count
+            last_active_week, weekly_streak = row.last_active_week, row.weekly_streak or 0
+        else:
+            tx_count = result.new_count
+            last_active_week, weekly_streak = None, 0
+        last_active_week, weekly_streak = advance_streak(
+            last_active_week, weekly_streak, (week_index(r['Timestamp']) for r in result.records))
+
+        values = {
+            'tx_count': tx_count,
+            'account': result.address,
+            'last_tx_id': result.newest_tx_id,
+            'last_active_week': last_active_week,
+            'weekly_streak': weekly_streak,
+            'last_updated': current_time,
+        }
+        if row is None:
+            inserts.append(dict(values, vly_user_id=vly_user_id))
+            SYNC_USERS.inc(outcome='inserted')
+        elif (row.tx_count, row.account, row.last_tx_id, row.last_active_week, row.weekly_streak) != \
+                (tx_count, result.address, result.newest_tx_id, last_active_week, weekly_streak):
+            updates.append(dict(values, id=row.id))
+            SYNC_USERS.inc(outcome='updated')
+        else:
+            SYNC_USERS.inc(outcome='unchanged')
+            continue
+
+        logger.debug(
+            f"Updated transactions for vly_user_id {vly_user_id}: count = {tx_count}"
+        )
+    return inserts, updates
+
+
+def write_transactions(inserts, updates):
+    """Bulk insert new rows and bulk update changed rows by primary key"""
+    for start in range(0, len(inserts), WRITE_BATCH_SIZE):
+        db.session.execute(insert(Transaction), inserts[start:start + WRITE_BATCH_SIZE])
+    for start in range(0, len(updates), WRITE_BATCH_SIZE):
+        db.session.execute(update(Transaction), updates[start:start + WRITE_BATCH_SIZE])
 
-    # Get all vly_user_ids
-    vly_user_ids = [user.vly_user_id for user in users]
 
-    # Get transaction counts for all users
+def sync_user_batch(vly_user_ids, current_time):
+    """
+    Fetch new transactions for a batch of users and stage the writes in the
+    current database transaction; the caller commits. Accounts that fail to
+    sync are left unchanged and retried by the next run, database errors are
+    raised. Safe to repeat for the same users, since counts only advance
+    past the stored high-water marks.
+    """
+    existing = load_transaction_state(vly_user_ids)
+
+    # Only stale or unknown users hit the user_mapping API
+    with SYNC_STAGE_SECONDS.time(stage='address_lookup'):
+        addresses, lookup_failed = resolve_addresses(vly_user_ids, current_time)
+    # Resume from the stored high-water mark while the account is unchanged
+    since_tx_ids = {
+        vly_user_id: row.last_tx_id
+        for vly_user_id, row in existing.items()
+        if row.account is not None and row.account == addresses.get(vly_user_id)
+    }
+    with SYNC_STAGE_SECONDS.time(stage='canister_query'):
+        sync_results = sync_accounts(vly_user_ids, addresses=addresses, since_tx_ids=since_tx_ids,
+                                     collect_records=True)
+
+    inserts, updates = plan_transaction_writes(vly_user_ids, sync_results, existing, since_tx_ids, current_time,
+                                               addresses, set(lookup_failed))
+    # Only accounts with new ledger entries, or synced from scratch, have new points inputs
+    refreshed_accounts = {
+        result.address for vly_user_id, result in sync_results.items()
+        if result is not None and (result.records or since_tx_ids.get(vly_user_id) is None)
+    }
+    with SYNC_STAGE_SECONDS.time(stage='db_write'):
+        write_transactions(inserts, updates)
+        write_ledger_entries(sync_results)
+        refresh_points_inputs(refreshed_accounts, datetime.utcfromtimestamp(CUTOFF_DATE))
+    logger.info(
+        f"Synced {len(vly_user_ids)} users: {len(inserts)} new, {len(updates)} changed, "
+        f"{len(vly_user_ids) - len(inserts) - len(updates)} unchanged or skipped"
+    )
+    return inserts, updates
+
+
+def finish_sync(run):
+    """Rebuild the data derived from every user's transactions and close the run"""
     try:
-        tx_counts = get_vly_transactions(vly_user_ids)
+        current_time = datetime.utcnow()
+        with SYNC_STAGE_SECONDS.time(stage='rebuild'):
+            expire_streaks(current_time)
+            update_points()
+            rebuild_leaderboard()
+            bump_sync_generation()
+            finish_sync_run(run, current_time)
+        with SYNC_STAGE_SECONDS.time(stage='commit'):
+            db.session.commit()
+        SYNC_LAST_SUCCESS.set(time.time())
+        logger.info(f"Sync run {run.id} finished for {run.users_done} users")
+        return True
     except Exception as e:
-        logger.error(f"Error fetching transaction data: {str(e)}")
-        return
+        logger.error(f"Error finishing sync run: {str(e)}")
+        db.session.rollback()
+        return False
 
-    for user in users:
-        try:
-            if user.vly_user_id not in tx_counts:
-                logger.warning(
-                    f"No transaction data for vly_user_id: {user.vly_user_id}")
-                continue
-
-            tx_count = tx_counts[user.vly_user_id]
-            if tx_count is None:
-                logger.warning(
-                    f"Failed to get transaction count for vly_user_id: {user.vly_user_id}"
-                )
-                continue
-
-            # Update or create transaction record
-            transaction = Transaction.query.filter_by(
-                vly_user_id=user.vly_user_id).first()
-            if not transaction:
-                transaction = Transaction(vly_user_id=user.vly_user_id)
-                db.session.add(transaction)
-
-            # Update transaction count
-            transaction.tx_count = tx_count
-
-            # Update last updated timestamp
-            transaction.last_updated = current_time
-
-            # Update weekly streak (you may want to implement the logic for this)
-            # transaction.update_weekly_streak()
-
-            logger.info(
-                f"Updated transactions for vly_user_id {user.vly_user_id}: count = {tx_count}"
-            )
 
+def update_transactions():
+    """
+    Update transaction data for all users based on the results from vly_api_like_tx.py.
+    Users are synced in batches that commit independently; if the process
+    dies, the next call resumes the unfinished run after its last batch.
+    """
+    run = start_sync_run()
+    while True:
+        vly_user_ids = next_user_batch(run)
+        if not vly_user_ids:
+            break
+        # Commit the batch and the checkpoint atomically
+        try:
+            sync_user_batch(vly_user_ids, datetime.utcnow())
+            checkpoint_sync_run(run, vly_user_ids)
+            with SYNC_STAGE_SECONDS.time(stage='commit'):
+                db.session.commit()
+            logger.info(f"Sync run {run.id}: {run.users_done}/{run.total_users} users done")
         except Exception as e:
-            logger.error(
-                f"Error updating transactions for vly_user_id {user.vly_user_id}: {str(e)}"
-            )
+            # Per-account upstream errors never get here, this is the database or a bug
+            logger.error(f"Error syncing transaction data: {str(e)}")
             db.session.rollback()
-            continue
+            logger.warning(f"Sync run {run.id} stopped, the next run resumes it")
+            return
 
-    # Commit all changes
-    try:
-        db.session.commit()
-        logger.info("Successfully committed all transaction updates")
-    except Exception as e:
-        logger.error(f"Error committing transaction updates: {str(e)}")
-        db.session.rollback()
+    # Derived data is rebuilt once every user is synced
+    finish_sync(run)
 
 
 if __name__ == "__main__":
+    from app import create_app
+    from scheduler import run_update_transactions
     app = create_app()  # アプリケーションを作成
-    with app.app_context(): 
-        update_transactions()
+    # Takes the same lock as the scheduler so runs never overlap
+    run_update_transactions(app)
@@ -0,0 +1,210 @@
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from metrics import UPSTREAM_REQUESTS, UPSTREAM_RETRIES, UPSTREAM_REJECTED
+
+logger = logging.getLogger(__name__)
+
+# Defaults shared by every upstream policy, see UpstreamPolicy
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv('UPSTREAM_MAX_ATTEMPTS', '4'))
+UPSTREAM_BACKOFF_BASE = float(os.getenv('UPSTREAM_BACKOFF_BASE', '0.5'))
+UPSTREAM_BACKOFF_MAX = float(os.getenv('UPSTREAM_BACKOFF_MAX', '30'))
+# Consecutive failures that open the circuit, and how long it stays open
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv('UPSTREAM_BREAKER_THRESHOLD', '5'))
+UPSTREAM_BREAKER_RESET = float(os.getenv('UPSTREAM_BREAKER_RESET', '60'))
+
+RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() blocks until a token is available.
+    The rate can be changed while in use, and pause() stops all callers,
+    e.g. for a Retry-After the upstream asked for.
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        self._lock = threading.Lock()
+        self._clock = clock
+        self._sleep = sleep
+        self._rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @rate.setter
+    def rate(self, rate):
+        with self._lock:
+            self._refill(self._clock())
+            self._rate = rate
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self._rate
+            self._sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_timeout seconds. Then a single probe call is let through; its
+    outcome closes the circuit or opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self._lock = threading.Lock()
+        self._clock = clock
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and self._clock() - self._opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning(f"Circuit opened after {self._failures} consecutive failures")
+                self.state = 'open'
+                self._opened_at = self._clock()
+
+
+def retry_after_seconds(exc, now=None):
+    """Seconds from the Retry-After header of the error's response, if any"""
+    response = getattr(exc, 'response', None)
+    value = getattr(response, 'headers', {}).get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at - (time.time() if now is None else now))
+
+
+class UpstreamPolicy:
+    """
+    Rate limit, retry and circuit breaker around calls to one upstream.
+
+    Errors whose response has a retryable HTTP status, or that are instances
+    of retry_on (connection errors, timeouts), are retried with jittered
+    exponential backoff, or after the Retry-After the upstream sent. Other
+    errors are raised right away. The request rate adapts to the upstream:
+    it is halved on every retryable error and grows back by rate_step per
+    success, between min_rate and max_rate.
+    """
+
+    def __init__(self, name, rate, burst=None, min_rate=None, rate_step=None, retry_on=(),
+                 max_attempts=UPSTREAM_MAX_ATTEMPTS, backoff_base=UPSTREAM_BACKOFF_BASE,
+                 backoff_max=UPSTREAM_BACKOFF_MAX, failure_threshold=UPSTREAM_BREAKER_THRESHOLD,
+                 reset_timeout=UPSTREAM_BREAKER_RESET, clock=time.monotonic, sleep=time.sleep):
+        self.name = name
+        self.max_rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 20
+        self.rate_step = rate_step if rate_step is not None else rate / 20
+        self.retry_on = tuple(retry_on)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.bucket = TokenBucket(rate, burst or max(1, int(rate)), clock, sleep)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock)
+        self._sleep = sleep
+
+    def is_retryable(self, exc):
+        response = getattr(exc, 'response', None)
+        status = getattr(response, 'status_code', None)
+        if status is not None:
+            return status in RETRYABLE_STATUS
+        return isinstance(exc, self.retry_on)
+
+    def backoff(self, attempt):
+        """Full-jitter delay before retry number attempt (1-based)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def call(self, func, *args, **kwargs):
+        for attempt in range(1, self.max_attempts + 1):
+            if not self.breaker.allow():
+                UPSTREAM_REJECTED.inc(upstream=self.name)
+                raise CircuitOpenError(f"{self.name}: circuit open, not calling upstream")
+            self.bucket.acquire()
+            UPSTREAM_REQUESTS.inc(upstream=self.name)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not self.is_retryable(e):
+                    # The upstream answered, it is only this request that is wrong
+                    self.breaker.record_success()
+                    raise
+                self._on_failure()
+                retry_after = retry_after_seconds(e)
+                if attempt == self.max_attempts or (retry_after or 0) > self.backoff_max:
+                    raise
+                if retry_after is not None:
+                    # Hold back every caller of this upstream, not only this one
+                    self.bucket.pause(retry_after)
+                    delay = retry_after
+                else:
+                    delay = self.backoff(attempt)
+                logger.warning(f"{self.name}: attempt {attempt} failed ({e}), retrying in {delay:.2f}s")
+                UPSTREAM_RETRIES.inc(upstream=self.name)
+                self._sleep(delay)
+                continue
+            self._on_success()
+            return result
+
+    def _on_success(self):
+        self.breaker.record_success()
+        if self.bucket.rate < self.max_rate:
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + self.rate_step)
+
+    def _on_failure(self):
+        self.breaker.record_failure()
+        self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
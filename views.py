@@ -1,16 +1,33 @@
-from flask import render_template, request, redirect, url_for, flash, send_file, jsonify, session
-from models import db, User, Transaction, Admin
+from flask import render_template, request, redirect, url_for, flash, send_file, jsonify, session, make_response, Response
+from models import db, User, Admin
 from flask_login import login_user, logout_user, login_required, current_user
-from flask_babel import gettext as _
+from flask_babel import gettext as _, get_locale
 from io import BytesIO, StringIO
 from datetime import datetime
 from flask_wtf.csrf import CSRFProtect
+from leaderboard import top_entries, current_sync_generation, ranking_page
+from response_cache import ResponseCache
+from stream import EventBroadcaster, LeaderboardPublisher, event_stream
+from sync_runs import sync_progress, update_sync_gauges
+from metrics import REGISTRY, CONTENT_TYPE
+from address_cache import AddressPrefetcher
+import os
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Bearer token required on /metrics when set
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 def register_routes(app):
     csrf = CSRFProtect(app)
+    # Rendered /leaderboard pages per locale for the current sync generation
+    leaderboard_cache = ResponseCache()
+    # One publisher per process feeds every /stream subscriber
+    broadcaster = EventBroadcaster()
+    publisher = LeaderboardPublisher(app, broadcaster)
+    # Looks up the address of new users so the next sync can skip user_mapping
+    address_prefetcher = AddressPrefetcher(app)
 
     @app.route('/')
     def index():
@@ -36,6 +53,7 @@ def register_routes(app):
             db.session.add(new_user)
             try:
                 db.session.commit()
+                address_prefetcher.submit(user_id)
                 flash(_('Registration successful!'), 'success')
                 return redirect(url_for('leaderboard'))
             except Exception as e:
@@ -138,17 +156,29 @@ def register_routes(app):
     @login_required
     def leaderboard():
         try:
-            transactions_vly_user_id = Transaction.query.order_by(Transaction.tx_count.desc()).limit(10).all()
-            transactions_count = Transaction.query.order_by(Transaction.tx_count.desc()).limit(10).all()
-            transactions_last_updated = Transaction.query.order_by(Transaction.tx_count.desc()).limit(10).all()
-
-            
-            count_data = [{'vly_user_id': t.vly_user_id, 'tx_count': t.tx_count} for t in transactions_count]
-            
-            return render_template('leaderboard.html', 
-                               transactions_points=count_data,
-                               transactions_count=count_data,
-                               transactions_amount=count_data)
+            generation = current_sync_generation()
+            locale = str(get_locale())
+            etag = f"leaderboard-{generation}-{locale}"
+            # Pages carrying flashed messages are rendered for this request only
+            cacheable = not session.get('_flashes')
+            if cacheable and request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                body = leaderboard_cache.get(generation, locale) if cacheable else None
+                if body is None:
+                    count_data = top_entries(10)
+                    body = render_template('leaderboard.html', 
+                                       transactions_points=count_data,
+                                       transactions_count=count_data,
+                                       transactions_amount=count_data)
+                    if cacheable:
+                        leaderboard_cache.put(generation, locale, body)
+                response = make_response(body)
+            if cacheable:
+                response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
                                
                        
         except Exception as e:
@@ -156,4 +186,37 @@ def register_routes(app):
             app.logger.error(f"Leaderboard error: {str(e)}")  # ログファイルにエラー詳細を記録
             flash(_('Error loading leaderboard data.'), 'error')
             return redirect(url_for('index'))
-    
+
+    @app.route('/api/leaderboard')
+    @login_required
+    def api_leaderboard():
+        # Unparseable values fall back to the defaults (first page, 50 entries)
+        after_count = request.args.get('after_count', type=int)
+        after_user = request.args.get('after_user')
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+
+        entries, next_cursor = ranking_page(after_count, after_user, limit)
+        return jsonify({'entries': entries, 'next': next_cursor})
+
+    @app.route('/api/sync/status')
+    @login_required
+    def api_sync_status():
+        return jsonify({'run': sync_progress()})
+
+    @app.route('/metrics')
+    def metrics():
+        if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        # Gauges read from the database are only refreshed when scraped
+        update_sync_gauges()
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+    @app.route('/stream')
+    @login_required
+    def stream():
+        publisher.ensure_started()
+        last_event_id = request.headers.get('Last-Event-ID', type=int)
+        response = Response(event_stream(broadcaster, last_event_id), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
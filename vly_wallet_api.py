@@ -1,52 +1,176 @@
 import os
 from dotenv import load_dotenv
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple, NamedTuple
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import threading
 from ic.identity import Identity
 from ic.client import Client
 from ic.agent import Agent
-from ic.candid import encode, Types
+from ic.candid import encode, decode, Types
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from upstream import UpstreamPolicy, CircuitOpenError
+from metrics import IC_PAGES, IC_DECODE_SECONDS
+from candid_scan import transaction_ids, CandidScanError
 
 # 環境変数をロード
 load_dotenv()
 
 # VlyWallet APIのシークレットトークンを環境変数から取得
 VLY_SECRET_TOKEN = os.getenv('VLY_SECRET_TOKEN')
+# user_mapping APIのベースURL(ベンチマークではローカルのスタンドインに向ける)
+VLY_API_BASE_URL = os.getenv('VLY_API_BASE_URL', 'https://service.vly.money')
+
+# ICRCインデックスキャニスターと集計条件
+LIKE_INDEX_CANISTER_ID = "mvtuy-wiaaa-aaaam-adh7a-cai"
+QUERY_AMOUNT = 100
+CUTOFF_DATE = datetime(2024, 11, 1, 0, 0, 0).timestamp()
+
+# user_mapping APIへの同時リクエスト数の上限
+VLY_API_CONCURRENCY = int(os.getenv('VLY_API_CONCURRENCY', '8'))
+
+# キャニスターへの並列クエリ数(ワーカーごとに専用のAgentを持つ)
+IC_BOUNDARY_NODE_URL = "https://icp-api.io"
+IC_QUERY_WORKERS = int(os.getenv('IC_QUERY_WORKERS', '4'))
+
+# 上流ごとのレート制限・リトライ・サーキットブレーカー(プロセス内の全スレッドで共有)
+VLY_API_RATE = float(os.getenv('VLY_API_RATE', '10'))
+IC_QUERY_RATE = float(os.getenv('IC_QUERY_RATE', '20'))
+VLY_API_POLICY = UpstreamPolicy(
+    'vly-api', VLY_API_RATE,
+    retry_on=(requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+)
+IC_QUERY_POLICY = UpstreamPolicy('ic-boundary-node', IC_QUERY_RATE, retry_on=(httpx.TransportError,))
+
+# 上流ごとのキープアライブ接続プールの大きさとタイムアウト(秒)。プールは同期をまたいで再利用する
+VLY_API_POOL_SIZE = int(os.getenv('VLY_API_POOL_SIZE', str(VLY_API_CONCURRENCY)))
+VLY_API_TIMEOUT = (float(os.getenv('VLY_API_CONNECT_TIMEOUT', '5')), float(os.getenv('VLY_API_READ_TIMEOUT', '30')))
+IC_POOL_SIZE = int(os.getenv('IC_POOL_SIZE', str(IC_QUERY_WORKERS)))
+IC_CONNECT_TIMEOUT = float(os.getenv('IC_CONNECT_TIMEOUT', '5'))
+IC_READ_TIMEOUT = float(os.getenv('IC_READ_TIMEOUT', '30'))
+
+_worker_state = threading.local()
+_pool_lock = threading.Lock()
+_vly_session = None
+_ic_http_client = None
+
+def vly_http_session() -> requests.Session:
+    """
+    user_mapping API用のプロセス共通Session。HTTPAdapterの接続プールで
+    TCP/TLS接続を使い回す
+    """
+    global _vly_session
+    with _pool_lock:
+        if _vly_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=VLY_API_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _vly_session = session
+        return _vly_session
+
+def ic_http_client() -> httpx.Client:
+    """
+    バウンダリーノード用のプロセス共通httpx.Client。スレッドセーフなので全Agentで共有する
+    """
+    global _ic_http_client
+    with _pool_lock:
+        if _ic_http_client is None:
+            _ic_http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=IC_POOL_SIZE, max_keepalive_connections=IC_POOL_SIZE),
+                timeout=httpx.Timeout(IC_READ_TIMEOUT, connect=IC_CONNECT_TIMEOUT),
+            )
+        return _ic_http_client
+
+def close_http_pools():
+    """共有の接続プールを閉じる。次に使われた時に作り直される"""
+    global _vly_session, _ic_http_client
+    with _pool_lock:
+        if _vly_session is not None:
+            _vly_session.close()
+        if _ic_http_client is not None:
+            _ic_http_client.close()
+        _vly_session = _ic_http_client = None
+
+def lookup_vly_wallet_address(user_id: str) -> Optional[str]:
+    """
+    user_mapping APIでアドレスを取得する。一時的なエラーはVLY_API_POLICYがリトライし、
+    それでも失敗した通信エラー、JSONデコードエラー、CircuitOpenErrorはそのまま送出する
+    """
+    url = f"{VLY_API_BASE_URL}/api/third_party/user_mapping?chain=icp&name={user_id}&scope=twitter"
+    headers = {
+        'secret-token': VLY_SECRET_TOKEN
+    }
+    print(f"リクエストURL: {url}")
+    print(f"ヘッダー: {headers}")
+
+    response = VLY_API_POLICY.call(_get_user_mapping, url, headers)
+    data = response.json()
+    address = data.get('data', {}).get('address')
+    if address:
+        print(f"ユーザー {user_id} のVlyWalletアドレス: {address}")
+    else:
+        print(f"ユーザー {user_id} のVlyWalletアドレスを取得できませんでした。")
+    return address
+
+def _get_user_mapping(url, headers):
+    response = vly_http_session().get(url, headers=headers, timeout=VLY_API_TIMEOUT)
+    print(f"ステータスコード: {response.status_code}")
+    print(f"レスポンスヘッダー: {response.headers}")
+    print(f"レスポンス本文: {response.text}")
+
+    # 429や5xxはVLY_API_POLICYがリトライする
+    response.raise_for_status()
+    return response
+
+def _try_lookup_vly_wallet_address(user_id: str) -> Tuple[Optional[str], bool]:
+    try:
+        return lookup_vly_wallet_address(user_id), True
+    except requests.exceptions.RequestException as e:
+        print(f"APIリクエストエラー: {e}")
+    except ValueError as e:
+        print(f"JSONデコードエラー: {e}")
+    except CircuitOpenError as e:
+        print(f"APIリクエストを中止しました: {e}")
+    return None, False
+
+def get_vly_wallet_address(user_id: str) -> Optional[str]:
+    address, _ = _try_lookup_vly_wallet_address(user_id)
+    return address
+
+def fetch_vly_wallet_addresses(user_ids: List[str], max_workers: Optional[int] = None) -> Tuple[Dict[str, Optional[str]], List[str]]:
+    """
+    user_mapping APIを最大max_workers並列で呼び出す。
+    成功したユーザーのアドレス(未登録ならNone)と、取得に失敗したユーザーIDのリストを返す
+    """
+    if not user_ids:
+        return {}, []
+    if max_workers is None:
+        max_workers = VLY_API_CONCURRENCY
+    max_workers = max(1, min(max_workers, len(user_ids)))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='vly-address') as executor:
+        results = list(executor.map(_try_lookup_vly_wallet_address, user_ids))
 
-def get_vly_wallet_addresses(user_ids: List[str]) -> Dict[str, Optional[str]]:
     addresses = {}
-    for user_id in user_ids:
-        url = f"https://service.vly.money/api/third_party/user_mapping?chain=icp&name={user_id}&scope=twitter"
-        headers = {
-            'secret-token': VLY_SECRET_TOKEN
-        }
-        try:
-            print(f"リクエストURL: {url}")
-            print(f"ヘッダー: {headers}")
-            
-            response = requests.get(url, headers=headers)
-            print(f"ステータスコード: {response.status_code}")
-            print(f"レスポンスヘッダー: {response.headers}")
-            print(f"レスポンス本文: {response.text}")
-            
-            response.raise_for_status()
-            data = response.json()
-            address = data.get('data', {}).get('address')
+    failed = []
+    for user_id, (address, ok) in zip(user_ids, results):
+        if ok:
             addresses[user_id] = address
-            if address:
-                print(f"ユーザー {user_id} のVlyWalletアドレス: {address}")
-            else:
-                print(f"ユーザー {user_id} のVlyWalletアドレスを取得できませんでした。")
-        except requests.exceptions.RequestException as e:
-            print(f"APIリクエストエラー: {e}")
-            addresses[user_id] = None
-        except ValueError as e:
-            print(f"JSONデコードエラー: {e}")
-            addresses[user_id] = None
-    return addresses
-
-def get_account_tx(account, query_amount):
+        else:
+            failed.append(user_id)
+    return addresses, failed
+
+def get_vly_wallet_addresses(user_ids: List[str], max_workers: Optional[int] = None) -> Dict[str, Optional[str]]:
+    """
+    user_mapping APIを最大max_workers並列で呼び出し、user_idの順序を保ったまま結果を返す
+    """
+    addresses, _ = fetch_vly_wallet_addresses(user_ids, max_workers)
+    return {user_id: addresses.get(user_id) for user_id in user_ids}
+
+def get_account_tx(account, query_amount, start=None):
     types = Types.Record({
         'max_results': Types.Nat,
         'start': Types.Opt(Types.Nat),
@@ -54,90 +178,283 @@ def get_account_tx(account, query_amount):
     })
     values = {
         'max_results': query_amount,
-        'start': [],
+        'start': [] if start is None else [start],
         'account': {'owner': account, 'subaccount': []},
     }
     params = [{'type': types, 'value': values}]
     return encode(params)
 
-def query_transactions(agent, like_index, usr_account, query_amount, cutoff_date):
+class AccountSync(NamedTuple):
+    address: str
+    # high-water markより新しく、cutoff_date以降のトランザクション数
+    new_count: int
+    # これまでに見た最新のトランザクションID(次回のhigh-water mark)
+    newest_tx_id: Optional[int]
+    # collect_records=Trueの場合、since_tx_idより新しいデコード済みレコード
+    records: Tuple[dict, ...] = ()
+
+def sync_account(agent, like_index, usr_account, query_amount, cutoff_date, since_tx_id=None,
+                 collect_records=False) -> AccountSync:
+    """
+    cutoff_date(エポック秒)以降かつsince_tx_idより新しいトランザクション数を数える。
+    get_account_transactionsは新しい順に返すので、startカーソルで古い方へページングし、
+    cutoff_dateより古いレコードか、既に数えたsince_tx_id以前のレコードに到達した時点で打ち切る。
+    collect_recordsがTrueなら、取得した新しいレコードを全フィールドでデコードして返す
+    """
+    # ICRCのタイムスタンプはナノ秒
+    cutoff_ns = int(cutoff_date * 1_000_000_000)
+    new_transactions_count = 0
+    newest_tx_id = since_tx_id
+    records = []
+    start = None
     while True:
-        usr_tx = agent.query_raw(
-            like_index,
-            "get_account_transactions",
-            get_account_tx(usr_account, query_amount)
+        page, page_records = _fetch_page(agent, like_index, usr_account, query_amount, start, collect_records)
+        if not page:
+            print("No more transactions. Process complete.")
+            break
+
+        page_ids = [tx_id for tx_id, _ in page]
+        if newest_tx_id is None or max(page_ids) > newest_tx_id:
+            newest_tx_id = max(page_ids)
+        new_transactions_count += sum(
+            1 for tx_id, timestamp in page
+            if timestamp >= cutoff_ns and (since_tx_id is None or tx_id > since_tx_id)
         )
-        processed_data = process_transactions(usr_tx)
-
-        if len(processed_data) == query_amount:
-            if any(tx['Timestamp'] >= cutoff_date for tx in processed_data):
-                query_amount += query_amount
-                print(f"Querying more transactions, new query amount: {query_amount}")
-            else:
-                print("No transactions after cutoff_date. Process complete.")
-                new_transactions_count = sum(1 for tx in processed_data if tx['Timestamp'] >= cutoff_date)
-                return new_transactions_count
-        else:
+        if collect_records:
+            records.extend(
+                tx for tx in page_records
+                if since_tx_id is None or tx['Transaction ID'] > since_tx_id
+            )
+
+        if len(page) < query_amount:
             print("Transaction count is less than query_amount. Process complete.")
-            new_transactions_count = sum(1 for tx in processed_data if tx['Timestamp'] >= cutoff_date)
-            return new_transactions_count
+            break
+        if any(timestamp < cutoff_ns for _, timestamp in page):
+            print("Reached transactions before cutoff_date. Process complete.")
+            break
+        if since_tx_id is not None and min(page_ids) <= since_tx_id:
+            print("Reached already counted transactions. Process complete.")
+            break
 
-def process_transactions(data):
-    transactions = []
+        # 次のページはこのページで最も古いトランザクションIDの直前から
+        start = min(page_ids)
+        print(f"Querying next page before transaction ID: {start}")
+
+    return AccountSync(usr_account, new_transactions_count, newest_tx_id, tuple(records))
+
+def _fetch_page(agent, like_index, usr_account, query_amount, start, collect_records):
+    """
+    1ページ分の(トランザクションID, タイムスタンプ)のリストと、collect_recordsがTrueなら全フィールドの
+    レコードを返す。集計だけなら返信のCandidバイト列からIDとタイムスタンプだけを読み、他のフィールドは
+    Pythonオブジェクトにしない
+    """
+    arg = get_account_tx(usr_account, query_amount, start)
+    if collect_records:
+        usr_tx = agent.query_raw(like_index, "get_account_transactions", arg)
+        IC_PAGES.inc()
+        with IC_DECODE_SECONDS.time():
+            page_records = process_transactions(usr_tx)
+        return [(tx['Transaction ID'], tx['Timestamp']) for tx in page_records], page_records
+
+    reply = agent.query_reply(like_index, "get_account_transactions", arg)
+    IC_PAGES.inc()
+    with IC_DECODE_SECONDS.time():
+        try:
+            return transaction_ids(reply), None
+        except CandidScanError as e:
+            # 想定外の形の返信は通常のデコーダで読む
+            print(f"Candid scan failed ({e}), falling back to full decoding.")
+            fields = ('Transaction ID', 'Timestamp')
+            return [(tx['Transaction ID'], tx['Timestamp']) for tx in iter_transactions(decode(reply), fields)], None
+
+def query_transactions(agent, like_index, usr_account, query_amount, cutoff_date):
+    """
+    cutoff_date(エポック秒)以降のトランザクション数を数える
+    """
+    return sync_account(agent, like_index, usr_account, query_amount, cutoff_date).new_count
+
+# process_transactionsの出力キーごとの、TransactionWithIdレコード内のCandidフィールドパス
+# _23515=id, _1266835934=transaction, _1191829844=kind, _2781795542=timestamp,
+# _3664621355=transfer(opt), _1136829802=from, _25979=to, _947296307=owner, _3573748184=amount
+TRANSACTION_FIELD_PATHS = {
+    'Transaction ID': ('_23515',),
+    'Type': ('_1266835934', '_1191829844'),
+    'Sender': ('_1266835934', '_3664621355', 0, '_1136829802', '_947296307'),
+    'Receiver': ('_1266835934', '_3664621355', 0, '_25979', '_947296307'),
+    'Amount': ('_1266835934', '_3664621355', 0, '_3573748184'),
+    'Timestamp': ('_1266835934', '_2781795542'),
+}
+TRANSACTION_FIELD_DEFAULTS = {'Amount': 0}
+
+_MISSING = object()
+
+@lru_cache(maxsize=None)
+def _compile_projection(fields):
+    """
+    fieldsのフィールドパスを1つの抽出関数にコンパイルする。共通のパスは1回だけ辿り、
+    途中で値が欠けているフィールドにはTRANSACTION_FIELD_DEFAULTSの値(なければNone)を入れる
+    """
+    lines = ["def extract(record):", "    n0 = record"]
+    nodes = {(): 'n0'}
+    namespace = {'_MISSING': _MISSING}
+    result = []
+    for index, field in enumerate(fields):
+        path = TRANSACTION_FIELD_PATHS[field]
+        for depth in range(1, len(path) + 1):
+            prefix = path[:depth]
+            if prefix in nodes:
+                continue
+            name = nodes[prefix] = f"n{len(nodes)}"
+            # _MISSINGへの添字アクセスはTypeErrorになるので、欠けた値はそのまま下に伝わる
+            lines += [
+                "    try:",
+                f"        {name} = {nodes[path[:depth - 1]]}[{prefix[-1]!r}]",
+                "    except (KeyError, IndexError, TypeError):",
+                f"        {name} = _MISSING",
+            ]
+        namespace[f"d{index}"] = TRANSACTION_FIELD_DEFAULTS.get(field)
+        leaf = nodes[path]
+        result.append(f"{field!r}: d{index} if {leaf} is _MISSING else {leaf}")
+    lines.append("    return {" + ", ".join(result) + "}")
+    exec("\n".join(lines), namespace)
+    return namespace['extract']
+
+def iter_transactions(data, fields=None):
+    """
+    get_account_transactionsのデコード結果から、fieldsで指定したキーだけを持つdictを順に返す。
+    fieldsを省略するとprocess_transactionsと同じ全キーを返す
+    """
+    extract = _compile_projection(tuple(fields or TRANSACTION_FIELD_PATHS))
     for item in data:
         value = item.get('value', {})
-        for key, details in value.items():
-            records = details.get('_3331539157', [])
-            for record in records:
-                record_details = record.get('_1266835934', {})
-                timestamp = record_details.get('_2781795542')
-                operation = record_details.get('_1191829844')
-                amount = record_details.get('_3664621355', [{}])[0].get('_3573748184', 0)
-                sender = (
-                    record_details.get('_3664621355', [{}])[0]
-                    .get('_25979', {})
-                    .get('_947296307', None)
-                )
-                receiver = (
-                    record_details.get('_3664621355', [{}])[0]
-                    .get('_1136829802', {})
-                    .get('_947296307', None)
-                )
-                transactions.append({
-                    'Transaction ID': record.get('_23515'),
-                    'Type': operation,
-                    'Sender': sender,
-                    'Receiver': receiver,
-                    'Amount': amount,
-                    'Timestamp': timestamp
-                })
-    return transactions
-
-def main(user_ids: List[str]) -> Dict[str, Optional[int]]:
-    print(f"使用するシークレットトークン: {VLY_SECRET_TOKEN}")
+        for details in value.values():
+            for record in details.get('_3331539157', ()):
+                yield extract(record)
+
+def process_transactions(data):
+    return list(iter_transactions(data))
+
+class PolicyClient(Client):
+    """
+    HTTPステータスを確認し、IC_QUERY_POLICYを通してクエリを送るClient。
+    ic-pyのClientはステータスを見ないため、429や5xxはCBORのデコードエラーになってしまう。
+    リクエストごとに接続を張るhttpx.postの代わりに、共有の接続プールを使う
+    """
+
+    def query(self, canister_id, data):
+        endpoint = self.url + '/api/v2/canister/' + canister_id + '/query'
+        return IC_QUERY_POLICY.call(self._post, endpoint, data)
+
+    def read_state(self, canister_id, data):
+        endpoint = self.url + '/api/v2/canister/' + canister_id + '/read_state'
+        return IC_QUERY_POLICY.call(self._post, endpoint, data)
+
+    def _post(self, endpoint, data):
+        ret = ic_http_client().post(endpoint, content=data, headers={'Content-Type': 'application/cbor'})
+        ret.raise_for_status()
+        return ret.content
+
+# 引数のないCandidメッセージ。デコードはほぼコストがかからない
+EMPTY_CANDID_REPLY = encode([])
 
-    # VlyWalletアドレスを取得
-    addresses = get_vly_wallet_addresses(user_ids)
+class RawReplyAgent(Agent):
+    """
+    query_rawの処理(署名、送信、ステータス確認)はそのまま使い、最後の返信のデコードだけを省くAgent。
+    query_endpointが返信のargを取り出し、query_rawには空のCandidメッセージを渡してデコードさせる
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._captured = threading.local()
+
+    def query_endpoint(self, canister_id, data):
+        result = super().query_endpoint(canister_id, data)
+        replies = getattr(self._captured, 'replies', None)
+        if replies is not None and isinstance(result, dict) and result.get('status') == 'replied':
+            replies.append(result['reply']['arg'])
+            result = dict(result, reply=dict(result['reply'], arg=EMPTY_CANDID_REPLY))
+        return result
+
+    def query_reply(self, canister_id, method_name, arg, **kwargs):
+        """
+        query_rawと同じ引数でクエリを送り、返信のargをバイト列のまま返す。rejectedの場合はValueError
+        """
+        self._captured.replies = replies = []
+        try:
+            result = self.query_raw(canister_id, method_name, arg, **kwargs)
+        finally:
+            self._captured.replies = None
+        if not replies:
+            raise ValueError(f"Query rejected: {result}")
+        return replies[0]
+
+def _new_agent():
+    return RawReplyAgent(Identity(), PolicyClient(url=IC_BOUNDARY_NODE_URL))
+
+def _worker_agent():
+    """
+    呼び出し元スレッド専用のAgentを返す。Agentはスレッド間で共有しない
+    """
+    agent = getattr(_worker_state, 'agent', None)
+    if agent is None:
+        agent = _worker_state.agent = _new_agent()
+    return agent
+
+def sync_accounts(user_ids: List[str],
+                  addresses: Optional[Dict[str, Optional[str]]] = None,
+                  since_tx_ids: Optional[Dict[str, Optional[int]]] = None,
+                  max_workers: Optional[int] = None,
+                  collect_records: bool = False) -> Dict[str, Optional[AccountSync]]:
+    """
+    各ユーザーのアカウントを最大max_workers並列で同期する。since_tx_idsにhigh-water markがある
+    ユーザーは、それより新しいトランザクションだけを取得する。結果はaddressesと同じ順序で返す。
+    同期に失敗したアカウントは、アドレスのないユーザーと同じくNoneになり、他のアカウントは続行する
+    """
+    # VlyWalletアドレスを取得(解決済みのアドレスが渡された場合はAPIを呼ばない)
+    if addresses is None:
+        addresses = get_vly_wallet_addresses(user_ids)
+    since_tx_ids = since_tx_ids or {}
+    if max_workers is None:
+        max_workers = IC_QUERY_WORKERS
 
     # ICRCトランザクション数を取得
-    ano = Identity()
-    client = Client(url="https://icp-api.io")
-    agent = Agent(ano, client)
-    like_index = "mvtuy-wiaaa-aaaam-adh7a-cai"
-    query_amount = 100
-    cutoff_date = datetime(2024, 11, 1, 0, 0, 0).timestamp()
-
-    tx_counts = {}
-    for user_id, address in addresses.items():
-        if address:
-            tx_count = query_transactions(agent, like_index, address, query_amount, cutoff_date)
-            tx_counts[user_id] = tx_count
-            print(f"ユーザー {user_id} のトランザクション数: {tx_count}")
+    accounts = [(user_id, address) for user_id, address in addresses.items() if address]
+
+    def sync_one(account):
+        user_id, address = account
+        try:
+            return sync_account(_worker_agent(), LIKE_INDEX_CANISTER_ID, address, QUERY_AMOUNT, CUTOFF_DATE,
+                                since_tx_ids.get(user_id), collect_records)
+        except Exception as e:
+            # デコードエラー、CircuitOpenError、リトライ対象外のエラーなど。1件の失敗で全体を止めない
+            print(f"ユーザー {user_id} の同期中にエラーが発生しました: {e}")
+            return None
+
+    synced = {}
+    if accounts:
+        max_workers = max(1, min(max_workers, len(accounts)))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ic-query') as executor:
+            synced = dict(zip((user_id for user_id, _ in accounts), executor.map(sync_one, accounts)))
+
+    results = {}
+    for user_id in addresses:
+        result = synced.get(user_id)
+        results[user_id] = result
+        if result:
+            print(f"ユーザー {user_id} の新しいトランザクション数: {result.new_count}")
         else:
-            tx_counts[user_id] = None
             print(f"ユーザー {user_id} のトランザクション数を取得できませんでした。")
 
-    return tx_counts
+    return results
+
+def main(user_ids: List[str], addresses: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Optional[int]]:
+    print(f"使用するシークレットトークン: {VLY_SECRET_TOKEN}")
+
+    results = sync_accounts(user_ids, addresses)
+    return {
+        user_id: result.new_count if result else None
+        for user_id, result in results.items()
+    }
 
 # 使用例
 if __name__ == "__main__":